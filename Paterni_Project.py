@@ -1,7 +1,17 @@
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
 from abc import ABC, abstractmethod
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
 
 # Абстрактний клас книги
 class Book(ABC):
+    __slots__ = ("title", "author", "price")
+
     def __init__(self, title: str, author: str, price: float):
         self.title = title
         self.author = author
@@ -13,12 +23,18 @@ class Book(ABC):
 
 # Конкретні класи книг
 class FictionBook(Book):
+    __slots__ = ()
+    INFO_TEMPLATE = 'Художня книга: "{0}" - {1}, ${2:.2f}'
+
     def get_info(self) -> str:
-        return f'Художня книга: "{self.title}" - {self.author}, ${self.price:.2f}'
+        return self.INFO_TEMPLATE.format(self.title, self.author, self.price)
 
 class ScienceBook(Book):
+    __slots__ = ()
+    INFO_TEMPLATE = 'Наукова книга: "{0}" - {1}, ${2:.2f}'
+
     def get_info(self) -> str:
-        return f'Наукова книга: "{self.title}" - {self.author}, ${self.price:.2f}'
+        return self.INFO_TEMPLATE.format(self.title, self.author, self.price)
 
 # Абстрактна фабрика
 class BookFactory(ABC):
@@ -26,6 +42,13 @@ class BookFactory(ABC):
     def create_book(self, title: str, author: str, price: float) -> Book:
         pass
 
+    def create_books(self, rows) -> list:
+        """Масове створення книг з кортежів (title, author, price); однакові автори зберігаються один раз."""
+        authors = {}
+        intern_author = authors.setdefault
+        create = self.create_book
+        return [create(title, intern_author(author, author), price) for title, author, price in rows]
+
 # Конкретні фабрики
 class FictionBookFactory(BookFactory):
     def create_book(self, title: str, author: str, price: float) -> Book:
@@ -35,6 +58,98 @@ class ScienceBookFactory(BookFactory):
     def create_book(self, title: str, author: str, price: float) -> Book:
         return ScienceBook(title, author, price)
 
+# Потоковий експорт каталогу: get_info-рядки пишуться у файл блоками через
+# буферизований запис, без одного великого проміжного рядка. Шаблон формату
+# береться один раз на підклас книги.
+def _render_chunk(rows) -> str:
+    lines = [template.format(title, author, price) for template, title, author, price in rows]
+    lines.append("")
+    return "\n".join(lines)
+
+_TEMPLATE_GET_INFO = (FictionBook.get_info, ScienceBook.get_info)
+
+def _export_row(book):
+    # Шаблон використовується лише тоді, коли get_info класу — шаблонна
+    # реалізація; інакше текст рендериться самим get_info у батьківському процесі
+    if type(book).get_info in _TEMPLATE_GET_INFO:
+        return type(book).INFO_TEMPLATE, book.title, book.author, book.price
+    return "{0}", book.get_info(), None, None
+
+def _chunks(books, chunk_size):
+    # Книги перетворюються на кортежі з шаблоном підкласу: їх дешевше
+    # передавати у процеси пулу, ніж самі об'єкти
+    rows = map(_export_row, books)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+def export_catalog(books, path, chunk_size=10_000, processes=None, buffer_size=1 << 20) -> int:
+    """Пише get_info усіх книг у файл; з processes блоки рендеряться пулом процесів у порядку каталогу."""
+    written = 0
+    with open(path, "w", encoding="utf-8", buffering=buffer_size) as file:
+        if not processes:
+            for chunk in _chunks(books, chunk_size):
+                file.write(_render_chunk(chunk))
+                written += len(chunk)
+            return written
+        # Не більше 2 блоків на процес у роботі, щоб пам'ять не росла з каталогом
+        with ProcessPoolExecutor(processes) as pool:
+            pending = deque()
+            for chunk in _chunks(books, chunk_size):
+                pending.append((len(chunk), pool.submit(_render_chunk, chunk)))
+                if len(pending) >= 2 * processes:
+                    size, future = pending.popleft()
+                    file.write(future.result())
+                    written += size
+            while pending:
+                size, future = pending.popleft()
+                file.write(future.result())
+                written += size
+    return written
+
+# Бенчмарк масового імпорту: об'єктів за секунду і байтів на книгу
+def benchmark_bulk_import(n_books=1_000_000):
+    factory = FictionBookFactory()
+    # Рядки фіду: кожен автор — окремий рядок, як після розбору файлу
+    rows = [(f"Книга {i}", f"Автор {i % 1000}", 9.99 + i % 50) for i in range(n_books)]
+
+    start = time.perf_counter()
+    created = factory.create_books(rows)
+    elapsed = time.perf_counter() - start
+    del created
+
+    tracemalloc.start()
+    created = factory.create_books(rows)
+    allocated, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(f"[Бенчмарк] {len(created)} книг за {elapsed:.2f} с "
+          f"({len(created) / elapsed:,.0f} об'єктів/с), {allocated / len(created):.0f} байт на книгу")
+
+def benchmark_export(n_books=1_000_000, path=os.path.join(tempfile.gettempdir(), "catalog_export.txt")):
+    rows = ((f"Книга {i}", f"Автор {i % 1000}", 9.99 + i % 50) for i in range(n_books))
+    books = FictionBookFactory().create_books(rows)
+
+    start = time.perf_counter()
+    naive = "".join(book.get_info() + "\n" for book in books)
+    with open(path, "w", encoding="utf-8") as file:
+        file.write(naive)
+    naive_time = time.perf_counter() - start
+    del naive
+
+    start = time.perf_counter()
+    export_catalog(books, path)
+    streaming_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    export_catalog(books, path, processes=4)
+    parallel_time = time.perf_counter() - start
+
+    print(f"[Бенчмарк] експорт {n_books} книг: конкатенація {naive_time:.2f} с, "
+          f"потоковий {streaming_time:.2f} с, 4 процеси {parallel_time:.2f} с")
+
 # Використання фабричного методу
 if __name__ == "__main__":
     fiction_factory = FictionBookFactory()
@@ -45,3 +160,7 @@ if __name__ == "__main__":
 
     print(book1.get_info())
     print(book2.get_info())
+
+    if "--bench" in sys.argv:
+        benchmark_bulk_import()
+        benchmark_export()
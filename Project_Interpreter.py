@@ -1,7 +1,24 @@
 # =========================
 # Патерн Інтерпретатор (Interpreter)
 # =========================
+import asyncio
+import csv
+import heapq
+import json
+import random
+import re
+import sqlite3
+import threading
+import time
 from abc import ABC, abstractmethod
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from itertools import compress, islice
+
+try:
+    import numpy as np
+except ImportError:  # колонковий рушій недоступний без NumPy
+    np = None
 
 # Інтерфейс виразу
 class Expression(ABC):
@@ -9,6 +26,107 @@ class Expression(ABC):
     def interpret(self, context: dict) -> bool:
         pass
 
+    def key(self) -> tuple:
+        """Структурний ключ виразу: однакові дерева мають однаковий ключ.
+        Ключ залежить від порядку дітей, тож план, скомпільований після
+        перестановки умов, не збігається з планом до неї."""
+        raise NotImplementedError
+
+    def canonical_key(self) -> tuple:
+        """Ключ без урахування порядку дітей AND/OR — для пошуку спільних умов."""
+        return self.key()
+
+    def to_source(self, consts: list) -> str:
+        """Python-вираз над контекстом `c`; константи додаються у consts як k0, k1, ..."""
+        raise NotImplementedError
+
+    def compile(self):
+        return compile_expression(self)
+
+    def mask(self, catalog) -> "np.ndarray":
+        """Булева маска над усім ColumnarCatalog за один прохід."""
+        raise NotImplementedError
+
+    def to_sql(self, params: list) -> str:
+        """Параметризована SQL-умова; значення додаються у params замість підстановки в текст."""
+        raise NotImplementedError
+
+    def conjuncts(self) -> list:
+        """Список умов, з'єднаних через AND на верхньому рівні."""
+        return [self]
+
+    def index_access(self, index) -> "IndexAccess | None":
+        """Доступ через індекс CatalogIndex або None, якщо умова не індексована."""
+        return None
+
+    @property
+    def stats(self):
+        """Статистика виконання вузла, яку збирає батьківський складений вираз."""
+        try:
+            return self._stats
+        except AttributeError:
+            self._stats = ExpressionStats()
+            return self._stats
+
+class ExpressionStats:
+    __slots__ = ("evaluations", "passed", "elapsed")
+
+    def __init__(self):
+        self.evaluations = 0
+        self.passed = 0
+        self.elapsed = 0.0
+
+    def record(self, result, elapsed):
+        self.evaluations += 1
+        self.passed += bool(result)
+        self.elapsed += elapsed
+
+    @property
+    def pass_rate(self):
+        return self.passed / self.evaluations if self.evaluations else 0.5
+
+    @property
+    def cost(self):
+        return self.elapsed / self.evaluations if self.evaluations else 0.0
+
+    def as_dict(self):
+        return {"evaluations": self.evaluations, "pass_rate": self.pass_rate, "cost": self.cost}
+
+# Складений вираз, що вимірює дітей на вибірці обчислень і періодично
+# переставляє їх: першою виконується найдешевша і найселективніша умова.
+class CompositeExpression(Expression):
+    SAMPLE_EVERY = 16
+    REORDER_EVERY = 64
+    _calls = 0
+
+    def _measure(self, child, context):
+        start = time.perf_counter()
+        result = child.interpret(context)
+        child.stats.record(result, time.perf_counter() - start)
+        return result
+
+    def _should_reorder(self):
+        return self._calls % (self.SAMPLE_EVERY * self.REORDER_EVERY) == 0
+
+    @staticmethod
+    def _measured(*children):
+        # Без жодного виміру cost дорівнює 0, і неспостережена умова
+        # завжди виграла б; перестановка чекає на дані про обидві
+        return all(child.stats.evaluations for child in children)
+
+    def reorder(self):
+        pass
+
+    def operands(self) -> tuple:
+        raise NotImplementedError
+
+    def combine_source(self, parts) -> str:
+        """Python-вираз над уже обчисленими вихідними кодами дітей."""
+        raise NotImplementedError
+
+    def to_source(self, consts):
+        return self.combine_source([child.to_source(consts) for child in self.operands()])
+
 # Конкретні вирази
 class PriceLessThan(Expression):
     def __init__(self, price):
@@ -17,6 +135,22 @@ class PriceLessThan(Expression):
     def interpret(self, context):
         return context.get("price", float('inf')) < self.price
 
+    def key(self):
+        return ("price<", self.price)
+
+    def to_source(self, consts):
+        return f'c.get("price", inf) < {_const(consts, self.price)}'
+
+    def to_sql(self, params):
+        params.append(self.price)
+        return "price < ?"
+
+    def mask(self, catalog):
+        return catalog.price < self.price
+
+    def index_access(self, index):
+        return index.price_access(f"price < {self.price!r}", high=self.price)
+
 class AuthorIs(Expression):
     def __init__(self, author):
         self.author = author
@@ -24,6 +158,23 @@ class AuthorIs(Expression):
     def interpret(self, context):
         return context.get("author") == self.author
 
+    def key(self):
+        return ("author=", self.author)
+
+    def to_source(self, consts):
+        return f'c.get("author") == {_const(consts, self.author)}'
+
+    def to_sql(self, params):
+        params.append(self.author)
+        return "author = ?"
+
+    def mask(self, catalog):
+        return catalog.author_codes == catalog.author_code(self.author)
+
+    def index_access(self, index):
+        ids = index.with_author(self.author)
+        return IndexAccess(f"author_index(author = {self.author!r})", len(ids), lambda: ids)
+
 class YearIs(Expression):
     def __init__(self, year):
         self.year = year
@@ -31,13 +182,800 @@ class YearIs(Expression):
     def interpret(self, context):
         return context.get("year") == self.year
 
-class AndExpression(Expression):
+    def key(self):
+        return ("year=", self.year)
+
+    def to_source(self, consts):
+        return f'c.get("year") == {_const(consts, self.year)}'
+
+    def to_sql(self, params):
+        params.append(self.year)
+        return "year = ?"
+
+    def mask(self, catalog):
+        return catalog.year == catalog.year_value(self.year)
+
+    def index_access(self, index):
+        ids = index.with_year(self.year)
+        return IndexAccess(f"year_index(year = {self.year!r})", len(ids), lambda: ids)
+
+class AndExpression(CompositeExpression):
+    # Діти зберігаються одним кортежем: reorder() замінює його цілком, а кожен
+    # метод читає його один раз, тож потоки, що ділять кешований вираз,
+    # завжди бачать або старий, або новий порядок, а не їх суміш
     def __init__(self, expr1, expr2):
-        self.expr1 = expr1
-        self.expr2 = expr2
+        self.children = (expr1, expr2)
+
+    @property
+    def expr1(self):
+        return self.children[0]
+
+    @property
+    def expr2(self):
+        return self.children[1]
+
+    def interpret(self, context):
+        first, second = self.children
+        self._calls += 1
+        if self._calls % self.SAMPLE_EVERY:
+            return first.interpret(context) and second.interpret(context)
+        result = self._measure(first, context) and self._measure(second, context)
+        if self._should_reorder():
+            self.reorder()
+        return result
+
+    def reorder(self):
+        # Для AND першою йде умова з найменшим cost / (1 - pass_rate):
+        # дешева і така, що найчастіше відкидає книгу.
+        def rank(child):
+            return child.stats.cost / max(1.0 - child.stats.pass_rate, 1e-9)
+        first, second = self.children
+        if self._measured(first, second) and rank(second) < rank(first):
+            self.children = (second, first)
+
+    def key(self):
+        first, second = self.children
+        return ("and", first.key(), second.key())
+
+    def canonical_key(self):
+        first, second = self.children
+        return ("and", frozenset((first.canonical_key(), second.canonical_key())))
+
+    def operands(self):
+        return self.children
+
+    def combine_source(self, parts):
+        return f"({parts[0]} and {parts[1]})"
+
+    def to_sql(self, params):
+        first, second = self.children
+        return f"({first.to_sql(params)} AND {second.to_sql(params)})"
+
+    def mask(self, catalog):
+        first, second = self.children
+        return first.mask(catalog) & second.mask(catalog)
+
+    def conjuncts(self):
+        first, second = self.children
+        return first.conjuncts() + second.conjuncts()
+
+class PriceAtMost(Expression):
+    def __init__(self, price):
+        self.price = price
 
     def interpret(self, context):
-        return self.expr1.interpret(context) and self.expr2.interpret(context)
+        return context.get("price", float('inf')) <= self.price
+
+    def key(self):
+        return ("price<=", self.price)
+
+    def to_source(self, consts):
+        return f'c.get("price", inf) <= {_const(consts, self.price)}'
+
+    def to_sql(self, params):
+        params.append(self.price)
+        return "price <= ?"
+
+    def mask(self, catalog):
+        return catalog.price <= self.price
+
+    def index_access(self, index):
+        return index.price_access(f"price <= {self.price!r}", high=self.price, include_high=True)
+
+class PriceGreaterThan(Expression):
+    def __init__(self, price):
+        self.price = price
+
+    def interpret(self, context):
+        return context.get("price", -float('inf')) > self.price
+
+    def key(self):
+        return ("price>", self.price)
+
+    def to_source(self, consts):
+        return f'c.get("price", -inf) > {_const(consts, self.price)}'
+
+    def to_sql(self, params):
+        params.append(self.price)
+        return "price > ?"
+
+    def mask(self, catalog):
+        return (catalog.price > self.price) & np.isfinite(catalog.price)
+
+    def index_access(self, index):
+        return index.price_access(f"price > {self.price!r}", low=self.price, include_low=False)
+
+class PriceAtLeast(Expression):
+    def __init__(self, price):
+        self.price = price
+
+    def interpret(self, context):
+        return context.get("price", -float('inf')) >= self.price
+
+    def key(self):
+        return ("price>=", self.price)
+
+    def to_source(self, consts):
+        return f'c.get("price", -inf) >= {_const(consts, self.price)}'
+
+    def to_sql(self, params):
+        params.append(self.price)
+        return "price >= ?"
+
+    def mask(self, catalog):
+        return (catalog.price >= self.price) & np.isfinite(catalog.price)
+
+    def index_access(self, index):
+        return index.price_access(f"price >= {self.price!r}", low=self.price)
+
+class PriceBetween(Expression):
+    def __init__(self, low, high):
+        self.low = low
+        self.high = high
+
+    def interpret(self, context):
+        return self.low <= context.get("price", float('inf')) <= self.high
+
+    def key(self):
+        return ("price between", self.low, self.high)
+
+    def to_source(self, consts):
+        return f'{_const(consts, self.low)} <= c.get("price", inf) <= {_const(consts, self.high)}'
+
+    def to_sql(self, params):
+        params.extend((self.low, self.high))
+        return "price BETWEEN ? AND ?"
+
+    def mask(self, catalog):
+        return (catalog.price >= self.low) & (catalog.price <= self.high)
+
+    def index_access(self, index):
+        return index.price_access(f"price BETWEEN {self.low!r} AND {self.high!r}",
+                                  low=self.low, high=self.high, include_high=True)
+
+class YearRange(Expression):
+    """Діапазон років з необов'язковими межами; книга без року не потрапляє в жоден діапазон."""
+    def __init__(self, low=None, high=None, include_low=True, include_high=True):
+        self.low = low
+        self.high = high
+        self.include_low = include_low
+        self.include_high = include_high
+
+    def _bounds(self):
+        if self.low is not None:
+            yield (">=" if self.include_low else ">"), self.low
+        if self.high is not None:
+            yield ("<=" if self.include_high else "<"), self.high
+
+    def interpret(self, context):
+        year = context.get("year")
+        if year is None:
+            return False
+        if self.low is not None and (year < self.low if self.include_low else year <= self.low):
+            return False
+        if self.high is not None and (year > self.high if self.include_high else year >= self.high):
+            return False
+        return True
+
+    def key(self):
+        return ("year range", self.low, self.high, self.include_low, self.include_high)
+
+    def to_source(self, consts):
+        parts = ['c.get("year") is not None']
+        parts += [f'c.get("year") {op} {_const(consts, value)}' for op, value in self._bounds()]
+        return "(" + " and ".join(parts) + ")"
+
+    def to_sql(self, params):
+        parts = []
+        for op, value in self._bounds():
+            params.append(value)
+            parts.append(f"year {op} ?")
+        return "(" + " AND ".join(parts or ["year IS NOT NULL"]) + ")"
+
+    def mask(self, catalog):
+        result = catalog.year != ColumnarCatalog.MISSING_YEAR
+        for op, value in self._bounds():
+            result &= {">=": np.greater_equal, ">": np.greater,
+                       "<=": np.less_equal, "<": np.less}[op](catalog.year, value)
+        return result
+
+class OrExpression(CompositeExpression):
+    # Діти — один кортеж, як у AndExpression
+    def __init__(self, expr1, expr2):
+        self.children = (expr1, expr2)
+
+    @property
+    def expr1(self):
+        return self.children[0]
+
+    @property
+    def expr2(self):
+        return self.children[1]
+
+    def interpret(self, context):
+        first, second = self.children
+        self._calls += 1
+        if self._calls % self.SAMPLE_EVERY:
+            return first.interpret(context) or second.interpret(context)
+        result = self._measure(first, context) or self._measure(second, context)
+        if self._should_reorder():
+            self.reorder()
+        return result
+
+    def reorder(self):
+        # Для OR першою йде умова з найменшим cost / pass_rate:
+        # дешева і така, що найчастіше одразу приймає книгу.
+        def rank(child):
+            return child.stats.cost / max(child.stats.pass_rate, 1e-9)
+        first, second = self.children
+        if self._measured(first, second) and rank(second) < rank(first):
+            self.children = (second, first)
+
+    def key(self):
+        first, second = self.children
+        return ("or", first.key(), second.key())
+
+    def canonical_key(self):
+        first, second = self.children
+        return ("or", frozenset((first.canonical_key(), second.canonical_key())))
+
+    def operands(self):
+        return self.children
+
+    def combine_source(self, parts):
+        return f"({parts[0]} or {parts[1]})"
+
+    def to_sql(self, params):
+        first, second = self.children
+        return f"({first.to_sql(params)} OR {second.to_sql(params)})"
+
+    def mask(self, catalog):
+        first, second = self.children
+        return first.mask(catalog) | second.mask(catalog)
+
+class NotExpression(CompositeExpression):
+    def __init__(self, expr):
+        self.expr = expr
+
+    def interpret(self, context):
+        self._calls += 1
+        if self._calls % self.SAMPLE_EVERY:
+            return not self.expr.interpret(context)
+        return not self._measure(self.expr, context)
+
+    def key(self):
+        return ("not", self.expr.key())
+
+    def canonical_key(self):
+        return ("not", self.expr.canonical_key())
+
+    def operands(self):
+        return (self.expr,)
+
+    def combine_source(self, parts):
+        return f"(not {parts[0]})"
+
+    def to_sql(self, params):
+        # NULL-поля в SQL дають NULL, а не FALSE, тож NOT обгортає умову в COALESCE,
+        # щоб збігатися з interpret() для книг без ціни, автора чи року.
+        return f"(NOT COALESCE({self.expr.to_sql(params)}, 0))"
+
+    def mask(self, catalog):
+        return ~self.expr.mask(catalog)
+
+# Компіляція дерева виразів в одну функцію-предикат.
+# Замість обходу дерева з віртуальними викликами interpret() генерується
+# плаский Python-вираз, який виконується одним викликом на кожну книгу.
+# Скомпільовані плани кешуються за структурним ключем виразу.
+MAX_COMPILED_PLANS = 1024
+_compiled_plans = {}
+
+def _const(consts, value):
+    consts.append(value)
+    return f"k{len(consts) - 1}"
+
+def compile_expression(expr):
+    """Скомпільований предикат; вираз без key()/to_source() (лише з interpret(),
+    як вимагає базовий контракт Expression) виконується через interpret без кешу."""
+    try:
+        key = expr.key()
+    except NotImplementedError:
+        return expr.interpret
+    plan = _compiled_plans.get(key)
+    if plan is None:
+        consts = []
+        try:
+            body = expr.to_source(consts)
+        except NotImplementedError:
+            return expr.interpret
+        namespace = {f"k{i}": value for i, value in enumerate(consts)}
+        namespace["inf"] = float('inf')
+        exec(f"def plan(c):\n    return {body}\n", namespace)
+        plan = namespace["plan"]
+        if len(_compiled_plans) >= MAX_COMPILED_PLANS:
+            _compiled_plans.clear()
+        _compiled_plans[key] = plan
+    return plan
+
+# Колонкове сховище каталогу для векторизованого виконання запитів.
+# Ціна і рік зберігаються як масиви NumPy, автор — як цілі коди словника,
+# тож запит обчислюється масковими операціями без циклу по книгах.
+class ColumnarCatalog:
+    MISSING_YEAR = -(2 ** 62)
+    UNKNOWN_AUTHOR = -1
+
+    def __init__(self, books):
+        if np is None:
+            raise ImportError("ColumnarCatalog потребує NumPy")
+        self.titles = [book.get("title") for book in books]
+        self.price = np.array([book.get("price", float('inf')) for book in books], dtype=np.float64)
+        self.year = np.array([self.year_value(book.get("year")) for book in books], dtype=np.int64)
+        self.authors = []
+        self._author_codes = {}
+        codes = [self._encode_author(book.get("author")) for book in books]
+        self.author_codes = np.array(codes, dtype=np.int32)
+
+    def __len__(self):
+        return len(self.titles)
+
+    def _encode_author(self, author):
+        code = self._author_codes.get(author)
+        if code is None:
+            code = self._author_codes[author] = len(self.authors)
+            self.authors.append(author)
+        return code
+
+    def author_code(self, author):
+        return self._author_codes.get(author, self.UNKNOWN_AUTHOR)
+
+    def year_value(self, year):
+        return self.MISSING_YEAR if year is None else year
+
+    def search(self, expression):
+        """Індекси книг, що задовольняють вираз."""
+        return np.flatnonzero(expression.mask(self))
+
+    def search_titles(self, expression):
+        return [self.titles[i] for i in self.search(expression)]
+
+# Вторинні індекси каталогу: відсортований індекс цін для діапазонних
+# запитів через bisect і хеш-індекси за автором та роком.
+class CatalogIndex:
+    def __init__(self, books=()):
+        self._books = {}
+        self._next_id = 0
+        self._price_keys = []
+        self._price_ids = []
+        self._by_author = {}
+        self._by_year = {}
+        for book in books:
+            self.add_book(book)
+
+    def __len__(self):
+        return len(self._books)
+
+    def add_book(self, book):
+        book_id = self._next_id
+        self._next_id += 1
+        self._books[book_id] = book
+        position = bisect_right(self._price_keys, book.get("price", float('inf')))
+        self._price_keys.insert(position, book.get("price", float('inf')))
+        self._price_ids.insert(position, book_id)
+        self._by_author.setdefault(book.get("author"), set()).add(book_id)
+        self._by_year.setdefault(book.get("year"), set()).add(book_id)
+        return book_id
+
+    def remove_book(self, book_id):
+        book = self._books.pop(book_id)
+        price = book.get("price", float('inf'))
+        lo = bisect_left(self._price_keys, price)
+        hi = bisect_right(self._price_keys, price)
+        position = self._price_ids.index(book_id, lo, hi)
+        del self._price_keys[position]
+        del self._price_ids[position]
+        self._discard(self._by_author, book.get("author"), book_id)
+        self._discard(self._by_year, book.get("year"), book_id)
+        return book
+
+    @staticmethod
+    def _discard(hash_index, value, book_id):
+        ids = hash_index[value]
+        ids.discard(book_id)
+        if not ids:
+            del hash_index[value]
+
+    def price_span(self, low=None, high=None, include_low=True, include_high=False):
+        """Позиції [start, end) у відсортованому індексі цін; книги без ціни не входять."""
+        keys = self._price_keys
+        if low is None:
+            start = 0
+        else:
+            start = (bisect_left if include_low else bisect_right)(keys, low)
+        if high is None:
+            end = bisect_left(keys, float('inf'))
+        else:
+            end = (bisect_right if include_high else bisect_left)(keys, high)
+        return start, max(start, end)
+
+    def price_access(self, condition, **bounds):
+        start, end = self.price_span(**bounds)
+        return IndexAccess(f"price_index({condition})", end - start,
+                           lambda: self._price_ids[start:end])
+
+    def with_author(self, author):
+        return self._by_author.get(author, ())
+
+    def with_year(self, year):
+        return self._by_year.get(year, ())
+
+    def plan(self, expression):
+        """Обирає найселективніший індексований кон'юнкт; решта умов стає фільтром."""
+        conjuncts = expression.conjuncts()
+        best, best_position = None, None
+        for position, condition in enumerate(conjuncts):
+            access = condition.index_access(self)
+            if access is not None and (best is None or access.estimate < best.estimate):
+                best, best_position = access, position
+        if best is not None:
+            del conjuncts[best_position]
+        residual = None
+        for condition in conjuncts:
+            residual = condition if residual is None else AndExpression(residual, condition)
+        return QueryPlan(self, best, residual)
+
+    def search(self, expression):
+        return self.plan(expression).execute()
+
+    def explain(self, expression):
+        return self.plan(expression).explain()
+
+class IndexAccess:
+    def __init__(self, name, estimate, fetch):
+        self.name = name
+        self.estimate = estimate
+        self.fetch = fetch
+
+class QueryPlan:
+    def __init__(self, index, access, residual):
+        self.index = index
+        self.access = access
+        self.residual = residual
+
+    def execute(self):
+        books = self.index._books
+        if self.access is None:
+            candidates = books.values()
+        else:
+            candidates = [books[book_id] for book_id in sorted(self.access.fetch())]
+        if self.residual is None:
+            return list(candidates)
+        plan = self.residual.compile()
+        return [book for book in candidates if plan(book)]
+
+    def explain(self):
+        if self.access is None:
+            lines = [f"FullScan catalog (~{len(self.index)} рядків)"]
+        else:
+            lines = [f"IndexScan {self.access.name} (~{self.access.estimate} рядків)"]
+        if self.residual is not None:
+            try:
+                condition = self.residual.key()
+            except NotImplementedError:
+                condition = type(self.residual).__name__
+            lines.append(f"  Filter: {condition}")
+        return "\n".join(lines)
+
+# Текстова мова запитів: токенізатор і парсер рекурсивного спуску, що будує
+# дерево Expression. Граматика (ключові слова без урахування регістру):
+#   query      := and_query (OR and_query)*
+#   and_query  := not_query (AND not_query)*
+#   not_query  := NOT not_query | '(' query ')' | comparison
+#   comparison := field op value | field BETWEEN value AND value
+_TOKEN_RE = re.compile(r"""
+    \s*(?:
+        (?P<number>-?\d+(?:\.\d+)?)
+      | (?P<string>'(?:[^']|'')*')
+      | (?P<op><=|>=|<|>|=)
+      | (?P<paren>[()])
+      | (?P<word>\w+)
+    )""", re.VERBOSE)
+
+_KEYWORDS = {"AND", "OR", "NOT", "BETWEEN"}
+
+_FIELDS = {
+    "price": "price", "ціна": "price",
+    "author": "author", "автор": "author",
+    "year": "year", "рік": "year",
+}
+
+_COMPARISONS = {
+    ("price", "<"): PriceLessThan,
+    ("price", "<="): PriceAtMost,
+    ("price", ">"): PriceGreaterThan,
+    ("price", ">="): PriceAtLeast,
+    ("price", "="): lambda price: PriceBetween(price, price),
+    ("author", "="): AuthorIs,
+    ("year", "<"): lambda year: YearRange(high=year, include_high=False),
+    ("year", "<="): lambda year: YearRange(high=year),
+    ("year", ">"): lambda year: YearRange(low=year, include_low=False),
+    ("year", ">="): lambda year: YearRange(low=year),
+    ("year", "="): YearIs,
+}
+
+_BETWEEN = {
+    "price": PriceBetween,
+    "year": YearRange,
+}
+
+# Допустимі типи літералів для полів: помилковий тип відхиляється під час
+# розбору, а не падає TypeError на кожній книзі під час виконання
+_LITERAL_TYPES = {
+    "price": (int, float),
+    "year": (int,),
+    "author": (str,),
+}
+
+def tokenize(text):
+    """Розбиває запит на токени (kind, value)."""
+    tokens = []
+    position = 0
+    text = text.rstrip()
+    while position < len(text):
+        match = _TOKEN_RE.match(text, position)
+        if match is None:
+            raise ValueError(f"Невідомий символ у запиті на позиції {position}: {text[position:]!r}")
+        kind = match.lastgroup
+        value = match.group(kind)
+        if kind == "number":
+            value = float(value) if "." in value else int(value)
+        elif kind == "string":
+            value = value[1:-1].replace("''", "'")
+        elif kind == "word":
+            upper = value.upper()
+            if upper in _KEYWORDS:
+                kind, value = "keyword", upper
+            elif value.lower() in _FIELDS:
+                kind, value = "field", _FIELDS[value.lower()]
+            else:
+                raise ValueError(f"Невідоме поле у запиті: {value!r}")
+        tokens.append((kind, value))
+        position = match.end()
+    return tokens
+
+def normalize_query(tokens):
+    """Канонічний текст запиту: регістр ключових слів і пробіли не впливають."""
+    parts = []
+    for kind, value in tokens:
+        if kind == "string":
+            parts.append("'" + value.replace("'", "''") + "'")
+        else:
+            parts.append(str(value))
+    return " ".join(parts)
+
+class QueryParser:
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.position = 0
+
+    def parse(self):
+        expression = self._or()
+        if self.position != len(self.tokens):
+            raise ValueError(f"Зайвий токен у запиті: {self.tokens[self.position][1]!r}")
+        return expression
+
+    def _peek(self):
+        if self.position < len(self.tokens):
+            return self.tokens[self.position]
+        return (None, None)
+
+    def _next(self, kind=None, value=None):
+        token = self._peek()
+        if token[0] is None or (kind and token[0] != kind) or (value and token[1] != value):
+            expected = value or kind or "токен"
+            raise ValueError(f"Очікувалось {expected}, отримано {token[1]!r}")
+        self.position += 1
+        return token[1]
+
+    def _or(self):
+        expression = self._and()
+        while self._peek() == ("keyword", "OR"):
+            self.position += 1
+            expression = OrExpression(expression, self._and())
+        return expression
+
+    def _and(self):
+        expression = self._not()
+        while self._peek() == ("keyword", "AND"):
+            self.position += 1
+            expression = AndExpression(expression, self._not())
+        return expression
+
+    def _not(self):
+        token = self._peek()
+        if token == ("keyword", "NOT"):
+            self.position += 1
+            return NotExpression(self._not())
+        if token == ("paren", "("):
+            self.position += 1
+            expression = self._or()
+            self._next("paren", ")")
+            return expression
+        return self._comparison()
+
+    def _value(self, field):
+        kind, value = self._peek()
+        if kind not in ("number", "string"):
+            raise ValueError(f"Очікувалось значення, отримано {value!r}")
+        if not isinstance(value, _LITERAL_TYPES[field]):
+            raise ValueError(f"Некоректне значення для поля {field!r}: {value!r}")
+        self.position += 1
+        return value
+
+    def _comparison(self):
+        field = self._next("field")
+        if self._peek() == ("keyword", "BETWEEN"):
+            self.position += 1
+            factory = _BETWEEN.get(field)
+            if factory is None:
+                raise ValueError(f"BETWEEN не підтримується для поля {field!r}")
+            low = self._value(field)
+            self._next("keyword", "AND")
+            high = self._value(field)
+            return factory(low, high)
+        op = self._next("op")
+        factory = _COMPARISONS.get((field, op))
+        if factory is None:
+            raise ValueError(f"Оператор {op!r} не підтримується для поля {field!r}")
+        return factory(self._value(field))
+
+def parse_query(text):
+    return QueryParser(tokenize(text)).parse()
+
+# Обмежений LRU-кеш розібраних запитів за нормалізованим текстом.
+# Кеш спільний для всіх потоків вітрини, тож доступ до OrderedDict
+# захищений блокуванням; розбір виконується поза ним. Повернуті дерева
+# спільні, тому AND/OR переставляють дітей атомарно (див. AndExpression).
+class QueryCache:
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self._plans = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def parse(self, text):
+        tokens = tokenize(text)
+        key = normalize_query(tokens)
+        with self._lock:
+            expression = self._plans.get(key)
+            if expression is not None:
+                self.hits += 1
+                self._plans.move_to_end(key)
+                return expression
+            self.misses += 1
+        expression = QueryParser(tokens).parse()
+        with self._lock:
+            # Інший потік міг розібрати той самий запит раніше — усі отримують одне дерево
+            expression = self._plans.setdefault(key, expression)
+            self._plans.move_to_end(key)
+            if len(self._plans) > self.maxsize:
+                self._plans.popitem(last=False)
+        return expression
+
+    def info(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses,
+                    "size": len(self._plans), "maxsize": self.maxsize}
+
+query_cache = QueryCache()
+
+# Каталог на SQLite: запит Expression перекладається у параметризований SQL,
+# тож пошук іде через індекси бази, а не через список у пам'яті.
+# Однаковий текст SQL для однакової структури запиту дозволяє sqlite3
+# повторно використовувати підготовлені оператори з власного кешу.
+class SQLiteCatalog:
+    def __init__(self, path=":memory:", cached_statements=256):
+        self.connection = sqlite3.connect(path, cached_statements=cached_statements)
+        self.connection.executescript("""
+            CREATE TABLE IF NOT EXISTS books (
+                id INTEGER PRIMARY KEY,
+                title TEXT,
+                author TEXT,
+                price REAL,
+                year INTEGER
+            );
+            CREATE INDEX IF NOT EXISTS books_price ON books (price);
+            CREATE INDEX IF NOT EXISTS books_author ON books (author);
+            CREATE INDEX IF NOT EXISTS books_year ON books (year);
+        """)
+
+    def add_books(self, books):
+        with self.connection:
+            self.connection.executemany(
+                "INSERT INTO books (title, author, price, year) VALUES (?, ?, ?, ?)",
+                ((book.get("title"), book.get("author"), book.get("price"), book.get("year"))
+                 for book in books))
+
+    def _select(self, expression, columns="title, author, price, year"):
+        params = []
+        where = expression.to_sql(params)
+        return f"SELECT {columns} FROM books WHERE {where}", params
+
+    def query(self, expression, batch_size=1000):
+        """Генератор книг-словників; результати читаються з курсора пакетами."""
+        sql, params = self._select(expression)
+        cursor = self.connection.execute(sql, params)
+        try:
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                for title, author, price, year in rows:
+                    yield {"title": title, "author": author, "price": price, "year": year}
+        finally:
+            cursor.close()
+
+    def explain(self, expression):
+        sql, params = self._select(expression)
+        rows = self.connection.execute("EXPLAIN QUERY PLAN " + sql, params).fetchall()
+        return "\n".join(row[-1] for row in rows)
+
+    def close(self):
+        self.connection.close()
+
+# Потокове виконання запитів над файлом каталогу (JSONL або CSV).
+# Записи читаються по одному, тож пам'ять не залежить від розміру файлу,
+# а перші результати з'являються до кінця читання.
+def iter_catalog_file(path):
+    with open(path, encoding="utf-8", newline="") as file:
+        if str(path).endswith(".csv"):
+            for row in csv.DictReader(file):
+                book = {field: value for field, value in row.items() if value not in (None, "")}
+                if "price" in book:
+                    book["price"] = float(book["price"])
+                if "year" in book:
+                    book["year"] = int(book["year"])
+                yield book
+        else:
+            for line in file:
+                if line.strip():
+                    yield json.loads(line)
+
+def _as_expression(query):
+    return query_cache.parse(query) if isinstance(query, str) else query
+
+def stream_query(path, query, limit=None):
+    """Генерує книги з файлу, що задовольняють запит; LIMIT зупиняє читання файлу."""
+    plan = _as_expression(query).compile()
+    matches = (book for book in iter_catalog_file(path) if plan(book))
+    yield from islice(matches, limit)
+
+def top_k_by_price(path, query, k, descending=False):
+    """ORDER BY price LIMIT k через купу з k елементів."""
+    plan = _as_expression(query).compile()
+    matches = (book for book in iter_catalog_file(path) if plan(book) and "price" in book)
+    select = heapq.nlargest if descending else heapq.nsmallest
+    return select(k, matches, key=lambda book: book["price"])
 
 # Дані про книги
 books = [
@@ -106,6 +1044,123 @@ class OrderMediator(Mediator):
 mediator = OrderMediator()
 mediator.confirmation.confirm()
 
+# Асинхронний варіант посередника: сервіси — корутини, посередник тримає
+# тисячі замовлень у роботі одночасно, а паралелізм кожного етапу
+# обмежений власним семафором. Пропускна здатність визначається
+# затримкою платіжного шлюзу, а не послідовною обробкою.
+class LoopSemaphore:
+    """Семафор, що створюється окремо для кожного event loop: той самий
+    посередник можна запускати в кількох asyncio.run() поспіль."""
+    def __init__(self, value):
+        self.value = value
+        self._loop = None
+        self._semaphore = None
+
+    def _current(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._semaphore = asyncio.Semaphore(self.value)
+        return self._semaphore
+
+    async def __aenter__(self):
+        await self._current().acquire()
+
+    async def __aexit__(self, *exc_info):
+        self._current().release()
+
+class LocalPaymentGateway:
+    def __init__(self, latency=0.05):
+        self.latency = latency
+        self.charged = 0
+
+    async def charge(self, order_id):
+        await asyncio.sleep(self.latency)
+        self.charged += 1
+        return True
+
+class AsyncPaymentService:
+    def __init__(self, mediator, gateway, concurrency):
+        self.mediator = mediator
+        self.gateway = gateway
+        self._slots = LoopSemaphore(concurrency)
+
+    async def pay(self, order_id):
+        """True, якщо замовлення оплачено й доставлено; відхилена оплата далі не йде."""
+        async with self._slots:
+            charged = await self.gateway.charge(order_id)
+        if not charged:
+            return False
+        return await self.mediator.notify(self, "paid", order_id)
+
+class AsyncDeliveryService:
+    def __init__(self, mediator, concurrency, latency=0.0):
+        self.mediator = mediator
+        self.latency = latency
+        self._slots = LoopSemaphore(concurrency)
+
+    async def deliver(self, order_id):
+        async with self._slots:
+            await asyncio.sleep(self.latency)
+        return True
+
+class AsyncOrderConfirmation:
+    def __init__(self, mediator, concurrency):
+        self.mediator = mediator
+        self._slots = LoopSemaphore(concurrency)
+
+    async def confirm(self, order_id):
+        async with self._slots:
+            await asyncio.sleep(0)
+        return await self.mediator.notify(self, "confirmed", order_id)
+
+class OrderBatchResult:
+    """Підсумок пакета: доставлені замовлення в порядку завершення і причини невдач
+    ("declined" для відхиленої оплати або виняток, що виник під час обробки)."""
+    def __init__(self):
+        self.delivered = []
+        self.failed = {}
+
+class AsyncOrderMediator(Mediator):
+    def __init__(self, gateway=None, payment_concurrency=100, delivery_concurrency=100,
+                 confirmation_concurrency=100, max_in_flight=None):
+        self.max_in_flight = max_in_flight or max(payment_concurrency, delivery_concurrency,
+                                                  confirmation_concurrency)
+        self.gateway = gateway or LocalPaymentGateway()
+        self.payment = AsyncPaymentService(self, self.gateway, payment_concurrency)
+        self.delivery = AsyncDeliveryService(self, delivery_concurrency)
+        self.confirmation = AsyncOrderConfirmation(self, confirmation_concurrency)
+
+    async def notify(self, sender, event, order_id=None):
+        if event == "confirmed":
+            return await self.payment.pay(order_id)
+        if event == "paid":
+            return await self.delivery.deliver(order_id)
+        return False
+
+    async def process_orders(self, order_ids):
+        """Обробляє пакет і повертає OrderBatchResult.
+        Замовлення беруть max_in_flight обробників зі спільного ітератора,
+        тож пам'ять залежить від ліміту в роботі, а не від розміру пакета.
+        Помилка одного замовлення не зупиняє решту пакета."""
+        order_ids = iter(order_ids)
+        result = OrderBatchResult()
+
+        async def worker():
+            for order_id in order_ids:
+                try:
+                    delivered = await self.confirmation.confirm(order_id)
+                except Exception as error:
+                    result.failed[order_id] = error
+                    continue
+                if delivered:
+                    result.delivered.append(order_id)
+                else:
+                    result.failed[order_id] = "declined"
+
+        await asyncio.gather(*(worker() for _ in range(self.max_in_flight)))
+        return result
+
 
 # =========================
 # Комбінований приклад: Інтерпретатор + Посередник
@@ -123,6 +1178,12 @@ class SpeedIs(Expression):
     def interpret(self, context):
         return context.delivery_speed == self.speed
 
+    def key(self):
+        return ("speed=", self.speed)
+
+    def to_source(self, consts):
+        return f"c.delivery_speed == {_const(consts, self.speed)}"
+
 class PaymentIs(Expression):
     def __init__(self, method):
         self.method = method
@@ -130,6 +1191,12 @@ class PaymentIs(Expression):
     def interpret(self, context):
         return context.payment_method == self.method
 
+    def key(self):
+        return ("payment=", self.method)
+
+    def to_source(self, consts):
+        return f"c.payment_method == {_const(consts, self.method)}"
+
 class CombinedOrderMediator(Mediator):
     def __init__(self):
         self.payment = PaymentService(self)
@@ -140,6 +1207,13 @@ class CombinedOrderMediator(Mediator):
             print("[Медіатор] Умови замовлення виконано")
             self.payment.pay()
 
+    def process_rules(self, network, context_obj):
+        fired = network.evaluate(context_obj)
+        if fired:
+            print("[Медіатор] Спрацювали правила:", ", ".join(fired))
+            self.payment.pay()
+        return fired
+
     def notify(self, sender, event):
         if event == "paid":
             self.delivery.deliver()
@@ -149,3 +1223,321 @@ context = OrderContext("express", "credit_card")
 expression = AndExpression(SpeedIs("express"), PaymentIs("credit_card"))
 combined_mediator = CombinedOrderMediator()
 combined_mediator.process_order(expression, context)
+
+# Мережа правил у стилі Rete: однакові умови (за canonical_key, тобто без
+# урахування порядку дітей AND/OR) з усіх правил об'єднуються у спільні
+# вузли, і кожна різна умова обчислюється один раз на замовлення. Уся мережа компілюється в одну функцію, яка
+# повертає результати кореневих вузлів усіх правил.
+class RuleNetwork:
+    def __init__(self):
+        self._names = []
+        self._roots = []
+        self._nodes = []
+        self._node_ids = {}
+        self._consts = []
+        self._evaluate = None
+
+    def add_rule(self, name, expression):
+        self._names.append(name)
+        self._roots.append(self._add_node(expression))
+        self._evaluate = None
+
+    def _add_node(self, expression):
+        key = expression.canonical_key()
+        node_id = self._node_ids.get(key)
+        if node_id is not None:
+            return node_id
+        if isinstance(expression, CompositeExpression):
+            children = [f"n{self._add_node(child)}" for child in expression.operands()]
+            source = expression.combine_source(children)
+        else:
+            source = expression.to_source(self._consts)
+        node_id = self._node_ids[key] = len(self._nodes)
+        self._nodes.append(source)
+        return node_id
+
+    def _compile(self):
+        lines = ["def evaluate(c):"]
+        lines += [f"    n{node_id} = {source}" for node_id, source in enumerate(self._nodes)]
+        roots = ", ".join(f"n{node_id}" for node_id in self._roots)
+        lines.append(f"    return ({roots},)")
+        namespace = {f"k{i}": value for i, value in enumerate(self._consts)}
+        namespace["inf"] = float('inf')
+        exec("\n".join(lines) + "\n", namespace)
+        return namespace["evaluate"]
+
+    def evaluate(self, context):
+        """Назви всіх правил, що спрацювали для замовлення."""
+        if not self._names:
+            return []
+        if self._evaluate is None:
+            self._evaluate = self._compile()
+        return list(compress(self._names, self._evaluate(context)))
+
+    def evaluate_batch(self, contexts):
+        if not self._names:
+            return [[] for _ in contexts]
+        if self._evaluate is None:
+            self._evaluate = self._compile()
+        evaluate, names = self._evaluate, self._names
+        return [list(compress(names, evaluate(context))) for context in contexts]
+
+    def info(self):
+        return {"rules": len(self._names), "nodes": len(self._nodes)}
+
+# Інструментування посередника: лічильники подій і викликів, гістограми
+# затримок notify/confirm/pay/deliver та наскрізна тривалість замовлення
+# від підтвердження (або process_order) до доставки. Рішення про вибірку
+# приймається один раз на замовлення; поза вибіркою рахуються лише лічильники.
+class LatencyHistogram:
+    """Гістограма затримок; сама не синхронізована — MediatorMetrics оновлює
+    і читає її під своїм блокуванням."""
+    BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+    def __init__(self):
+        self.counts = [0] * (len(self.BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect_left(self.BUCKETS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+
+    def as_dict(self):
+        return {"buckets": dict(zip(self.BUCKETS + (float('inf'),), self.counts)),
+                "count": self.count, "sum": self.total}
+
+    def prometheus_lines(self, name, labels):
+        prefix = labels + "," if labels else ""
+        cumulative = 0
+        lines = []
+        for bound, count in zip(self.BUCKETS + (float('inf'),), self.counts):
+            cumulative += count
+            le = "+Inf" if bound == float('inf') else repr(bound)
+            lines.append(f'{name}_bucket{{{prefix}le="{le}"}} {cumulative}')
+        suffix = f"{{{labels}}}" if labels else ""
+        lines.append(f"{name}_sum{suffix} {self.total}")
+        lines.append(f"{name}_count{suffix} {self.count}")
+        return lines
+
+class MediatorMetrics:
+    def __init__(self, sample_rate=1.0):
+        self.sample_rate = sample_rate
+        self.events = {}
+        self.calls = {}
+        self.latency = {}
+        self.order_duration = LatencyHistogram()
+        # Початок поточного замовлення і рішення про вибірку — свої для
+        # кожного потоку, бо метрики спільні для посередників і потоків
+        self._order = threading.local()
+        # Лічильники й гістограми оновлюються read-modify-write, тож їх
+        # захищає одне блокування; виклик самого методу виконується поза ним
+        self._lock = threading.Lock()
+        self._random = random.Random()
+
+    def _sample(self):
+        return self.sample_rate >= 1.0 or self._random.random() < self.sample_rate
+
+    def _observe(self, operation, seconds):
+        # Викликається під self._lock
+        histogram = self.latency.get(operation)
+        if histogram is None:
+            histogram = self.latency[operation] = LatencyHistogram()
+        histogram.observe(seconds)
+
+    def wrap(self, operation, method, starts_order=False, ends_order=False):
+        order = self._order
+
+        def timed(*args, **kwargs):
+            order_start = getattr(order, "start", None)
+            opened = starts_order and order_start is None
+            if opened:
+                # False позначає замовлення поза вибіркою
+                order_start = order.start = time.perf_counter() if self._sample() else False
+            if order_start is None:
+                sampled = self._sample()
+            else:
+                sampled = order_start is not False
+            with self._lock:
+                self.calls[operation] = self.calls.get(operation, 0) + 1
+            start = time.perf_counter() if sampled else 0.0
+            try:
+                return method(*args, **kwargs)
+            finally:
+                if sampled:
+                    end = time.perf_counter()
+                    with self._lock:
+                        self._observe(operation, end - start)
+                        if ends_order and order_start:
+                            self.order_duration.observe(end - order_start)
+                if opened:
+                    order.start = None
+        return timed
+
+    def wrap_notify(self, notify):
+        timed = self.wrap("notify", notify)
+
+        def counted(sender, event, *args, **kwargs):
+            with self._lock:
+                self.events[event] = self.events.get(event, 0) + 1
+            return timed(sender, event, *args, **kwargs)
+        return counted
+
+    def snapshot(self):
+        with self._lock:
+            return self._snapshot()
+
+    def _snapshot(self):
+        return {
+            "events": dict(self.events),
+            "calls": dict(self.calls),
+            "latency": {operation: histogram.as_dict() for operation, histogram in self.latency.items()},
+            "order_duration": self.order_duration.as_dict(),
+            "sample_rate": self.sample_rate,
+        }
+
+    def to_prometheus(self):
+        with self._lock:
+            return self._prometheus_text()
+
+    def _prometheus_text(self):
+        lines = ["# TYPE mediator_events_total counter"]
+        lines += [f'mediator_events_total{{event="{event}"}} {count}' for event, count in self.events.items()]
+        lines.append("# TYPE mediator_calls_total counter")
+        lines += [f'mediator_calls_total{{operation="{operation}"}} {count}'
+                  for operation, count in self.calls.items()]
+        lines.append("# TYPE mediator_operation_seconds histogram")
+        for operation, histogram in self.latency.items():
+            lines += histogram.prometheus_lines("mediator_operation_seconds", f'operation="{operation}"')
+        lines.append("# TYPE mediator_order_duration_seconds histogram")
+        lines += self.order_duration.prometheus_lines("mediator_order_duration_seconds", "")
+        return "\n".join(lines) + "\n"
+
+def instrument(mediator, metrics=None):
+    """Обгортає notify посередника і методи його компонентів; повертає MediatorMetrics."""
+    metrics = metrics or MediatorMetrics()
+    mediator.notify = metrics.wrap_notify(mediator.notify)
+    if hasattr(mediator, "process_order"):
+        mediator.process_order = metrics.wrap("process_order", mediator.process_order, starts_order=True)
+    components = (("confirmation", "confirm", True, False),
+                  ("payment", "pay", False, False),
+                  ("delivery", "deliver", False, True))
+    for attribute, method_name, starts_order, ends_order in components:
+        component = getattr(mediator, attribute, None)
+        if component is not None:
+            method = getattr(component, method_name)
+            setattr(component, method_name, metrics.wrap(method_name, method, starts_order, ends_order))
+    return metrics
+
+
+# =========================
+# Бенчмарк: обхід дерева interpret() проти скомпільованого плану
+# =========================
+
+def benchmark_compiled(n_books=300_000):
+    catalog = [books[i % len(books)] for i in range(n_books)]
+    query = AndExpression(PriceLessThan(100), AuthorIs("Дж. Р. Р. Толкін"))
+
+    start = time.perf_counter()
+    interpreted = [book for book in catalog if query.interpret(book)]
+    interpret_time = time.perf_counter() - start
+
+    plan = query.compile()
+    start = time.perf_counter()
+    compiled = [book for book in catalog if plan(book)]
+    compiled_time = time.perf_counter() - start
+
+    assert interpreted == compiled
+    print(f"[Бенчмарк] {n_books} книг: interpret() {interpret_time:.3f} с, "
+          f"compile() {compiled_time:.3f} с, прискорення x{interpret_time / compiled_time:.1f}")
+
+
+def benchmark_columnar(n_books=1_000_000):
+    if np is None:
+        print("[Бенчмарк] NumPy не встановлено, колонковий рушій пропущено")
+        return
+    catalog = [books[i % len(books)] for i in range(n_books)]
+    query = AndExpression(PriceLessThan(100), AuthorIs("Дж. Р. Р. Толкін"))
+    columns = ColumnarCatalog(catalog)
+
+    plan = query.compile()
+    start = time.perf_counter()
+    compiled = [i for i, book in enumerate(catalog) if plan(book)]
+    compiled_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    vectorized = columns.search(query)
+    vectorized_time = time.perf_counter() - start
+
+    assert compiled == vectorized.tolist()
+    print(f"[Бенчмарк] {n_books} книг: compile() {compiled_time:.3f} с, "
+          f"mask() {vectorized_time:.4f} с, прискорення x{compiled_time / vectorized_time:.0f}")
+
+
+def benchmark_adaptive(n_books=300_000):
+    catalog = [books[i % len(books)] for i in range(n_books)]
+    # Користувач поставив першою умову, яку проходять усі книги
+    query = AndExpression(PriceLessThan(1000), YearIs(1954))
+    start = time.perf_counter()
+    matched = sum(1 for book in catalog if query.interpret(book))
+    elapsed = time.perf_counter() - start
+    print(f"[Бенчмарк] адаптивний AND: {matched} збігів за {elapsed:.3f} с, "
+          f"першою тепер виконується {query.expr1.key()}")
+    for child in (query.expr1, query.expr2):
+        print("   ", child.key(), child.stats.as_dict())
+
+
+if __name__ == "__main__":
+    import sys
+
+    print("\n[План запиту]")
+    print(CatalogIndex(books).explain(query))
+
+    print("\n[Текстовий запит]")
+    text_query = "price < 100 AND author = 'Дж. Р. Р. Толкін' OR price BETWEEN 70 AND 80"
+    for _ in range(3):
+        parsed = query_cache.parse(text_query)
+    print([book["title"] for book in books if parsed.interpret(book)])
+    print("Кеш планів:", query_cache.info())
+
+    print("\n[SQLite]")
+    sqlite_catalog = SQLiteCatalog()
+    sqlite_catalog.add_books(books)
+    print([book["title"] for book in sqlite_catalog.query(parsed)])
+    print(sqlite_catalog.explain(query))
+    sqlite_catalog.close()
+
+    print("\n[Мережа правил]")
+    network = RuleNetwork()
+    network.add_rule("express_card", AndExpression(SpeedIs("express"), PaymentIs("credit_card")))
+    network.add_rule("card_express", AndExpression(PaymentIs("credit_card"), SpeedIs("express")))
+    network.add_rule("cash", PaymentIs("cash"))
+    network.add_rule("not_cash_express", AndExpression(SpeedIs("express"), NotExpression(PaymentIs("cash"))))
+    print(network.info())
+    combined_mediator.process_rules(network, context)
+    print(network.evaluate_batch([OrderContext("standard", "cash"), OrderContext("express", "paypal")]))
+
+    print("\n[Метрики посередника]")
+    instrumented_mediator = OrderMediator()
+    metrics = instrument(instrumented_mediator)
+    instrumented_mediator.confirmation.confirm()
+    instrumented_combined = CombinedOrderMediator()
+    instrument(instrumented_combined, metrics)
+    instrumented_combined.process_order(expression, context)
+    snapshot = metrics.snapshot()
+    print("Події:", snapshot["events"], "| замовлень виміряно:", snapshot["order_duration"]["count"])
+    print("\n".join(metrics.to_prometheus().splitlines()[:4]))
+
+    print("\n[Асинхронний конвеєр замовлень]")
+    async_mediator = AsyncOrderMediator(LocalPaymentGateway(latency=0.05), payment_concurrency=500)
+    start = time.perf_counter()
+    delivered = asyncio.run(async_mediator.process_orders(range(5000))).delivered
+    elapsed = time.perf_counter() - start
+    print(f"Доставлено {len(delivered)} замовлень за {elapsed:.2f} с "
+          f"({len(delivered) / elapsed:.0f} замовлень/с)")
+
+    if "--bench" in sys.argv:
+        benchmark_compiled()
+        benchmark_columnar()
+        benchmark_adaptive()
@@ -1,3 +1,13 @@
+import base64
+import heapq
+import json
+import queue
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
 # ===============================
 # 1. Iterator — Промо-кампанії
 # ===============================
@@ -8,15 +18,110 @@ class Book:
         self.price = price
 
 class PromoCampaign:
-    def __init__(self, name):
+    """Промо-кампанія; книги можна брати з лінивого джерела source(offset, limit)
+    порціями по chunk_size, не завантажуючи всю кампанію в пам'ять."""
+    def __init__(self, name, source=None, chunk_size=1000, prefetch=False):
         self.name = name
         self._books = []
+        self._source = source or self._list_source
+        self.chunk_size = chunk_size
+        self.prefetch = prefetch
 
     def add_book(self, book):
         self._books.append(book)
 
+    def _list_source(self, offset, limit):
+        return self._books[offset:offset + limit]
+
     def __iter__(self):
-        return iter(self._books)
+        return CampaignIterator(self)
+
+    def page(self, cursor=None):
+        """Одна порція книг і курсор наступної (None, якщо кампанія закінчилась)."""
+        if isinstance(cursor, str):
+            cursor = CampaignCursor.from_token(cursor)
+        cursor = cursor or CampaignCursor(self.name, 0, self.chunk_size)
+        if cursor.campaign != self.name:
+            raise ValueError(f"Курсор належить кампанії '{cursor.campaign}', а не '{self.name}'")
+        # Розмір порції з клієнтського токена не може перевищувати chunk_size,
+        # інакше один запит завантажив би в пам'ять усю кампанію
+        limit = min(cursor.limit, self.chunk_size)
+        books = self._source(cursor.offset, limit)
+        if len(books) < limit:
+            return books, None
+        return books, CampaignCursor(self.name, cursor.offset + len(books), limit)
+
+class CampaignCursor:
+    """Серіалізована позиція в кампанії: клієнт API відновлює сторінку без повторного проходу."""
+    def __init__(self, campaign, offset, limit):
+        # Токен приходить від клієнта, тому позиція перевіряється до використання в зрізі
+        if type(offset) is not int or offset < 0:
+            raise ValueError(f"Некоректний зсув курсора: {offset!r}")
+        if type(limit) is not int or limit <= 0:
+            raise ValueError(f"Некоректний розмір порції курсора: {limit!r}")
+        self.campaign = campaign
+        self.offset = offset
+        self.limit = limit
+
+    def to_token(self):
+        data = json.dumps([self.campaign, self.offset, self.limit], ensure_ascii=False)
+        return base64.urlsafe_b64encode(data.encode("utf-8")).decode("ascii")
+
+    @classmethod
+    def from_token(cls, token):
+        try:
+            campaign, offset, limit = json.loads(base64.urlsafe_b64decode(token.encode("ascii")))
+        except (ValueError, TypeError) as error:
+            raise ValueError(f"Некоректний токен курсора: {token!r}") from error
+        return cls(campaign, offset, limit)
+
+class CampaignIterator:
+    """Ітератор порціями: у пам'яті поточна порція і, за prefetch, наступна."""
+    def __init__(self, campaign, cursor=None):
+        self._campaign = campaign
+        self._cursor = cursor or CampaignCursor(campaign.name, 0, campaign.chunk_size)
+        self._chunk = iter(())
+        self._position = self._cursor.offset
+        self._pending = None
+        self._executor = ThreadPoolExecutor(max_workers=1) if campaign.prefetch else None
+
+    def __iter__(self):
+        return self
+
+    def _fetch(self, cursor):
+        return self._campaign.page(cursor)
+
+    def _next_chunk(self):
+        if self._cursor is None:
+            return False
+        if self._pending is not None:
+            books, next_cursor = self._pending.result()
+        else:
+            books, next_cursor = self._fetch(self._cursor)
+        self._chunk = iter(books)
+        self._cursor = next_cursor
+        self._pending = None
+        if self._executor is not None:
+            if next_cursor is not None:
+                self._pending = self._executor.submit(self._fetch, next_cursor)
+            else:
+                self._executor.shutdown(wait=False)
+        return bool(books)
+
+    def __next__(self):
+        while True:
+            try:
+                book = next(self._chunk)
+            except StopIteration:
+                if not self._next_chunk():
+                    raise
+                continue
+            self._position += 1
+            return book
+
+    def cursor(self):
+        """Курсор на першу ще не видану книгу."""
+        return CampaignCursor(self._campaign.name, self._position, self._campaign.chunk_size)
 
 # ===============================
 # 2. Iterator + State — Рекомендації
@@ -30,27 +135,159 @@ class RecommendationIterator:
         return iter(self._books)
 
 class UserState:
-    def recommend(self, books):
+    def recommend(self, books, k=None):
         raise NotImplementedError
 
+def select_by_title(books, term, k=None):
+    """Книги, у назві яких є term; з k — top-k за рангом через купу.
+    Для TitleIndex працює через індекс, для звичайного списку — перебором."""
+    if isinstance(books, TitleIndex):
+        return books.search(term, k)
+    term = term.lower()
+    matches = [b for b in books if term in b.title.lower()]
+    if k is None:
+        return matches
+    return heapq.nsmallest(k, matches, key=lambda b: (b.title.lower().find(term), len(b.title)))
+
 class NewUserState(UserState):
-    def recommend(self, books):
-        return RecommendationIterator([b for b in books if 'popular' in b.title.lower()])
+    def recommend(self, books, k=None):
+        return RecommendationIterator(select_by_title(books, 'popular', k))
 
 class RegularUserState(UserState):
-    def recommend(self, books):
-        return RecommendationIterator([b for b in books if 'classic' in b.title.lower()])
+    def recommend(self, books, k=None):
+        return RecommendationIterator(select_by_title(books, 'classic', k))
 
 class VIPUserState(UserState):
-    def recommend(self, books):
-        return RecommendationIterator(books)
+    def recommend(self, books, k=None):
+        return RecommendationIterator(books if k is None else list(islice(books, k)))
+
+# Інвертований індекс токенів назв у нижньому регістрі. Для терміну
+# знаходяться токени словника, що його містять, і об'єднуються їхні
+# списки книг, тож час пошуку залежить від кількості збігів, а не від
+# розміру каталогу. Індекс оновлюється при додаванні та видаленні книг.
+class TitleIndex:
+    _TOKEN_RE = re.compile(r"\w+")
+
+    def __init__(self, books=()):
+        self._books = {}
+        self._titles = {}
+        self._ids = {}
+        self._postings = {}
+        self._term_tokens = {}
+        self._next_id = 0
+        self.version = 0
+        self.recommendations = RecommendationCache(self)
+        for book in books:
+            self.add_book(book)
+
+    def __iter__(self):
+        return iter(list(self._books.values()))
+
+    def __len__(self):
+        return len(self._books)
+
+    def add_book(self, book):
+        book_id = self._next_id
+        self._next_id += 1
+        self._books[book_id] = book
+        self._ids[id(book)] = book_id
+        self._index(book_id, book)
+        self.version += 1
+
+    def update_book(self, book, **changes):
+        """Змінює поля книги з переіндексацією назви і новою версією каталогу."""
+        book_id = self._ids[id(book)]
+        self._unindex(book_id)
+        for field, value in changes.items():
+            setattr(book, field, value)
+        self._index(book_id, book)
+        self.version += 1
+
+    def remove_book(self, book):
+        book_id = self._ids.pop(id(book))
+        del self._books[book_id]
+        self._unindex(book_id)
+        self.version += 1
+
+    def _index(self, book_id, book):
+        title = self._titles[book_id] = book.title.lower()
+        for token in set(self._TOKEN_RE.findall(title)):
+            postings = self._postings.get(token)
+            if postings is None:
+                postings = self._postings[token] = set()
+                for term, tokens in self._term_tokens.items():
+                    if term in token:
+                        tokens.add(token)
+            postings.add(book_id)
+
+    def _unindex(self, book_id):
+        title = self._titles.pop(book_id)
+        for token in set(self._TOKEN_RE.findall(title)):
+            postings = self._postings[token]
+            postings.discard(book_id)
+            if not postings:
+                del self._postings[token]
+                for tokens in self._term_tokens.values():
+                    tokens.discard(token)
+
+    def _matching_ids(self, term):
+        if not self._TOKEN_RE.fullmatch(term):
+            # Термін з пробілами чи розділовими знаками може перетинати межі токенів
+            return {book_id for book_id, title in self._titles.items() if term in title}
+        tokens = self._term_tokens.get(term)
+        if tokens is None:
+            tokens = self._term_tokens[term] = {token for token in self._postings if term in token}
+        ids = set()
+        for token in tokens:
+            ids |= self._postings[token]
+        return ids
+
+    def search(self, term, k=None):
+        term = term.lower()
+        ids = self._matching_ids(term)
+        if k is None:
+            return [self._books[book_id] for book_id in sorted(ids)]
+        titles = self._titles
+        best = heapq.nsmallest(k, ids, key=lambda book_id: (titles[book_id].find(term),
+                                                            len(titles[book_id]), book_id))
+        return [self._books[book_id] for book_id in best]
 
 class User:
     def __init__(self, state):
         self.state = state
 
-    def get_recommendations(self, books):
-        return self.state.recommend(books)
+    def get_recommendations(self, books, k=None):
+        if isinstance(books, TitleIndex):
+            return books.recommendations.get(self.state, k)
+        return self.state.recommend(books, k)
+
+# Кеш рекомендацій: результат залежить лише від класу стану користувача і
+# вмісту каталогу, тому він обчислюється один раз на (клас стану, k) для
+# поточної версії каталогу. Зміна версії TitleIndex скидає кеш.
+class RecommendationCache:
+    def __init__(self, catalog):
+        self._catalog = catalog
+        self._version = catalog.version
+        self._results = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, state, k=None):
+        if self._version != self._catalog.version:
+            self._results.clear()
+            self._version = self._catalog.version
+        key = (type(state), k)
+        books = self._results.get(key)
+        if books is None:
+            self.misses += 1
+            books = self._results[key] = list(state.recommend(self._catalog, k))
+        else:
+            self.hits += 1
+        return RecommendationIterator(books)
+
+    def recommend_many(self, users, k=None):
+        """Рекомендації для багатьох користувачів: по одному обчисленню на клас стану."""
+        return [self.get(user.state, k) for user in users]
 
 # ===============================
 # 3. Iterator + State + Chain of Responsibility — Повернення
@@ -62,6 +299,11 @@ class BookReturnRequest:
         self.status = "На перевірці"
 
 class Handler:
+    """Ланка ланцюжка. Власну роботу ланки слід описувати в process():
+    ReturnPipeline викликає лише process(), тож ланка з перевизначеним
+    handle() у пакетному режимі не підтримується."""
+    terminal = False
+
     def __init__(self):
         self._next = None
 
@@ -69,27 +311,123 @@ class Handler:
         self._next = handler
         return handler
 
+    def process(self, request):
+        """Власна робота ланки, без передачі запиту далі."""
+        return request
+
     def handle(self, request):
-        if self._next:
+        request = self.process(request)
+        if self._next and not self.terminal:
             return self._next.handle(request)
         return request
 
 class QualityCheckHandler(Handler):
-    def handle(self, request):
+    def process(self, request):
         print(f"Перевірка цілісності книги '{request.book.title}'")
-        return super().handle(request)
+        return request
 
 class StockManagerHandler(Handler):
-    def handle(self, request):
+    def process(self, request):
         print(f"Перевірка актуальності книги '{request.book.title}'")
-        return super().handle(request)
+        return request
 
 class AdminHandler(Handler):
-    def handle(self, request):
+    terminal = True
+
+    def process(self, request):
         print(f"Адміністратор ухвалює рішення по книзі '{request.book.title}'")
         request.status = "Повернено у продаж"
         return request
 
+# Пакетна обробка повернень конвеєром: кожна ланка ланцюжка працює у
+# власному потоці, між ланками — обмежені черги (зворотний тиск). Порядок
+# запитів у пакеті зберігається, бо кожен етап обробляє чергу по одному.
+# Виграш дають ланки, що чекають на I/O (склад, облікові системи).
+class _StageError:
+    def __init__(self, error):
+        self.error = error
+
+class StageStats:
+    def __init__(self, name):
+        self.name = name
+        self.processed = 0
+        self.busy = 0.0
+
+    def throughput(self):
+        return self.processed / self.busy if self.busy else 0.0
+
+    def as_dict(self):
+        return {"processed": self.processed, "busy": self.busy, "per_second": self.throughput()}
+
+class ReturnPipeline:
+    _DONE = object()
+
+    def __init__(self, chain, queue_size=256):
+        self.stages = []
+        handler = chain
+        while handler is not None:
+            if type(handler).handle is not Handler.handle:
+                raise TypeError(f"{type(handler).__name__} перевизначає handle(); "
+                                "для конвеєра робота ланки має бути в process()")
+            self.stages.append(handler)
+            handler = None if handler.terminal else handler._next
+        self.queue_size = queue_size
+        self.stats = [StageStats(type(stage).__name__) for stage in self.stages]
+
+    def _work(self, stage, stats, source, target):
+        while True:
+            request = source.get()
+            if request is self._DONE:
+                target.put(request)
+                return
+            if not isinstance(request, _StageError):
+                start = time.perf_counter()
+                try:
+                    request = stage.process(request)
+                except Exception as error:
+                    request = _StageError(error)
+                stats.busy += time.perf_counter() - start
+                stats.processed += 1
+            target.put(request)
+
+    def _feed(self, requests, target):
+        # Помилка джерела запитів передається далі, а _DONE надсилається завжди,
+        # інакше run() чекав би на останню чергу безкінечно
+        try:
+            for request in requests:
+                target.put(request)
+        except Exception as error:
+            target.put(_StageError(error))
+        finally:
+            target.put(self._DONE)
+
+    def run(self, requests):
+        queues = [queue.Queue(self.queue_size) for _ in range(len(self.stages) + 1)]
+        threads = [threading.Thread(target=self._feed, args=(requests, queues[0]), daemon=True)]
+        for position, (stage, stats) in enumerate(zip(self.stages, self.stats)):
+            threads.append(threading.Thread(target=self._work, daemon=True,
+                                            args=(stage, stats, queues[position], queues[position + 1])))
+        for thread in threads:
+            thread.start()
+        results = []
+        errors = []
+        while True:
+            request = queues[-1].get()
+            if request is self._DONE:
+                break
+            if isinstance(request, _StageError):
+                errors.append(request.error)
+            else:
+                results.append(request)
+        for thread in threads:
+            thread.join()
+        if errors:
+            raise errors[0]
+        return results
+
+    def report(self):
+        return {stats.name: stats.as_dict() for stats in self.stats}
+
 # ===============================
 # Демонстрація роботи
 # ===============================
@@ -109,9 +447,31 @@ if __name__ == '__main__':
     for book in user.get_recommendations(books):
         print(f"- {book.title}")
 
+    catalog = TitleIndex(books)
+    catalog.add_book(Book("Unpopular opinions", 90))
+    print("\n[Рекомендації з індексу назв, top-2]")
+    for book in user.get_recommendations(catalog, k=2):
+        print(f"- {book.title}")
+
+    # Кеш рекомендацій: один розрахунок на клас стану для версії каталогу
+    users = [User(NewUserState()) for _ in range(1000)] + [User(RegularUserState()) for _ in range(1000)]
+    catalog.recommendations.recommend_many(users)
+    catalog.update_book(books[2], title="Modern classic")
+    print("\n[Класика після зміни каталогу]:",
+          [book.title for book in User(RegularUserState()).get_recommendations(catalog)])
+    print("Кеш рекомендацій:", catalog.recommendations.hits, "влучань,",
+          catalog.recommendations.misses, "промахів")
+
     # 3. Повернення книжки
     request = BookReturnRequest(Book("Класика ХХ століття", 130))
     chain = QualityCheckHandler()
     chain.set_next(StockManagerHandler()).set_next(AdminHandler())
     result = chain.handle(request)
     print(f"\n[Результат перевірки повернення]: {result.status}")
+
+    # 4. Пакетна обробка повернень конвеєром
+    batch = [BookReturnRequest(Book(f"Повернення {i}", 100)) for i in range(3)]
+    pipeline = ReturnPipeline(chain, queue_size=2)
+    processed = pipeline.run(batch)
+    print(f"\n[Пакет повернень]: {[request.status for request in processed]}")
+    print(pipeline.report())
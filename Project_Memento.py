@@ -1,3 +1,26 @@
+import csv
+import gzip
+import json
+import mmap
+import os
+import random
+import struct
+import sys
+import threading
+import time
+import weakref
+import zlib
+from array import array
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+try:
+    import numpy as np
+except ImportError:  # колонкова аналітика недоступна без NumPy
+    np = None
+
+
 # 📦 Клас Книга
 class Book:
     def __init__(self, title, genre, price):
@@ -33,38 +56,108 @@ class Order:
 
 
 # 📦 Клас Кошика з Memento
+# Знімки зберігаються як різниці: кожен знімок містить лише операції
+# add/remove відносно попереднього і посилається на нього. Кожні
+# CHECKPOINT_EVERY знімків (або коли операцій більше, ніж книг) робиться
+# повна контрольна точка, тож відновлення повторює обмежену кількість операцій.
 class Cart:
+    CHECKPOINT_EVERY = 32
+
     def __init__(self):
         self.books = []
+        self._last_memento = None
+        self._pending = []
 
     def add_book(self, book):
         self.books.append(book)
+        self._pending.append((CartMemento.ADD, book))
 
     def remove_book(self, book):
         if book in self.books:
             self.books.remove(book)
+            self._pending.append((CartMemento.REMOVE, book))
 
     def create_memento(self):
-        return CartMemento(self.books[:])
+        parent = self._last_memento
+        if (parent is None or parent.depth + 1 >= self.CHECKPOINT_EVERY
+                or len(self._pending) > len(self.books)):
+            memento = CartMemento(self.books)
+        else:
+            memento = CartMemento(parent=parent, ops=tuple(self._pending))
+        self._last_memento = memento
+        self._pending = []
+        return memento
 
     def restore(self, memento):
         self.books = memento.get_state()
+        self._last_memento = memento
+        self._pending = []
 
 
 class CartMemento:
-    def __init__(self, state):
-        self._state = state
+    ADD = "add"
+    REMOVE = "remove"
+
+    __slots__ = ("_state", "_parent", "_ops", "depth")
+
+    def __init__(self, state=None, parent=None, ops=()):
+        if parent is None:
+            self._state = tuple(state)
+            self.depth = 0
+        else:
+            self._state = None
+            self.depth = parent.depth + 1
+        self._parent = parent
+        self._ops = ops
+
+    @property
+    def is_checkpoint(self):
+        return self._parent is None
+
+    @property
+    def parent(self):
+        return self._parent
+
+    @property
+    def ops(self):
+        return self._ops
 
     def get_state(self):
-        return self._state[:]
+        chain = []
+        memento = self
+        while memento._parent is not None:
+            chain.append(memento)
+            memento = memento._parent
+        books = list(memento._state)
+        for delta in reversed(chain):
+            for op, book in delta._ops:
+                if op == CartMemento.ADD:
+                    books.append(book)
+                else:
+                    books.remove(book)
+        return books
+
+    def checkpoint(self):
+        """Перетворює знімок на повну контрольну точку і відпускає старіші знімки."""
+        if self._parent is not None:
+            self._state = tuple(self.get_state())
+            self._parent = None
+            self._ops = ()
+            self.depth = 0
 
 
 class CartHistory:
-    def __init__(self):
-        self.history = []
+    def __init__(self, max_depth=None):
+        self.max_depth = max_depth
+        self.history = deque()
 
     def save(self, memento):
         self.history.append(memento)
+        if self.max_depth is not None and len(self.history) > self.max_depth:
+            self.history.popleft()
+            # Найстаріший збережений знімок стає контрольною точкою,
+            # щоб витіснені знімки не утримувались через ланцюжок різниць
+            self.history[0].checkpoint()
 
     def undo(self):
         if self.history:
@@ -72,6 +165,227 @@ class CartHistory:
         return None
 
 
+# 💾 Довготривала історія кошика: журнал знімків лише з дописуванням у кінець.
+# Запис = заголовок (тип, довжина, CRC32) + JSON. Знімок-різниця пишеться як DELTA
+# відносно попереднього запису, інакше — повний SNAPSHOT; undo дописує POP.
+# У пам'яті тримаються лише зсуви живих записів, а самі записи читаються
+# через mmap під час undo. Обірваний запис у кінці (збій під час дописування)
+# відкидається під час відкриття: журнал обрізається до останнього цілого запису.
+# Журнал порівнює книги як рядки (title, genre, price); undo повертає ті самі
+# об'єкти Book, що були збережені цим журналом і ще живі (слабкі посилання),
+# тож кошик після відкату й далі знаходить книги, на які посилається код.
+# Для кожного живого запису в пам'яті також тримається його відстань від
+# останнього SNAPSHOT, щоб save() не читав журнал.
+class FileCartHistory:
+    SNAPSHOT = 1
+    DELTA = 2
+    POP = 3
+    _HEADER = struct.Struct("<BII")
+
+    def __init__(self, path, checkpoint_every=32, fsync=False):
+        self.path = path
+        self.checkpoint_every = checkpoint_every
+        self.fsync = fsync
+        self._lock = threading.RLock()
+        self._top = None
+        self._books = weakref.WeakValueDictionary()
+        self._open()
+
+    def _open(self):
+        self._file = open(self.path, "ab")
+        self._map = None
+        self._stack = array("Q")
+        self._depths = array("I")
+        end = 0
+        for offset, kind, length in self._records():
+            if kind == self.POP:
+                if not self._stack:
+                    break
+                self._stack.pop()
+                self._depths.pop()
+            elif kind == self.DELTA:
+                if not self._stack:
+                    break
+                self._stack.append(offset)
+                self._depths.append(self._depths[-1] + 1)
+            else:
+                self._stack.append(offset)
+                self._depths.append(0)
+            end = offset + self._HEADER.size + length
+        if end < self._file.tell():
+            if self._map is not None:
+                self._map.close()
+                self._map = None
+            self._file.truncate(end)
+            self._file.seek(0, os.SEEK_END)
+
+    def _view(self):
+        size = self._file.tell()
+        if size == 0:
+            return b""
+        if self._map is None or len(self._map) < size:
+            if self._map is not None:
+                self._map.close()
+            with open(self.path, "rb") as file:
+                self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._map
+
+    def _records(self):
+        """Цілі записи журналу; зупиняється на першому неповному або пошкодженому."""
+        view = self._view()
+        size = self._file.tell()
+        offset = 0
+        while offset + self._HEADER.size <= size:
+            kind, length, checksum = self._HEADER.unpack_from(view, offset)
+            start = offset + self._HEADER.size
+            if (kind not in (self.SNAPSHOT, self.DELTA, self.POP) or start + length > size
+                    or zlib.crc32(view[start:start + length]) != checksum):
+                return
+            yield offset, kind, length
+            offset = start + length
+
+    def _read(self, offset):
+        view = self._view()
+        kind, length, _ = self._HEADER.unpack_from(view, offset)
+        start = offset + self._HEADER.size
+        return kind, json.loads(bytes(view[start:start + length]))
+
+    @classmethod
+    def _encode(cls, kind, payload):
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        return cls._HEADER.pack(kind, len(data), zlib.crc32(data)) + data
+
+    def _append(self, kind, payload):
+        offset = self._file.tell()
+        self._file.write(self._encode(kind, payload))
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+        return offset
+
+    def __len__(self):
+        return len(self._stack)
+
+    def save(self, memento):
+        with self._lock:
+            if (self._top is not None and memento.parent is self._top
+                    and self._depths[-1] + 1 < self.checkpoint_every):
+                payload = [[op, *self._row(book)] for op, book in memento.ops]
+                offset = self._append(self.DELTA, payload)
+                self._depths.append(self._depths[-1] + 1)
+            else:
+                payload = [list(self._row(book)) for book in memento.get_state()]
+                offset = self._append(self.SNAPSHOT, payload)
+                self._depths.append(0)
+            self._stack.append(offset)
+            self._top = memento
+
+    def _row(self, book):
+        row = (book.title, book.genre, book.price)
+        self._books[row] = book
+        return row
+
+    def _book(self, row):
+        book = self._books.get(row)
+        if book is None:
+            book = self._books[row] = Book(*row)
+        return book
+
+    def _state_at(self, position):
+        start = position - self._depths[position]
+        rows = [tuple(row) for row in self._read(self._stack[start])[1]]
+        for offset in self._stack[start + 1:position + 1]:
+            for op, *row in self._read(offset)[1]:
+                if op == CartMemento.ADD:
+                    rows.append(tuple(row))
+                else:
+                    rows.remove(tuple(row))
+        return rows
+
+    def undo(self):
+        with self._lock:
+            if not self._stack:
+                return None
+            rows = self._state_at(len(self._stack) - 1)
+            self._stack.pop()
+            self._depths.pop()
+            self._append(self.POP, None)
+            self._top = None
+            return CartMemento([self._book(row) for row in rows])
+
+    def compact(self, keep=None):
+        """Переписує журнал: прибирає POP і мертві записи, а всі живі записи,
+        окрім останніх keep, згортає в одну контрольну точку."""
+        with self._lock:
+            count = len(self._stack)
+            keep = count if keep is None else min(keep, count)
+            temporary = self.path + ".compact"
+            with open(temporary, "wb") as target:
+                first = count - keep
+                if first > 0:
+                    records = [(self.SNAPSHOT, [list(row) for row in self._state_at(first - 1)])]
+                elif count:
+                    records = [(self.SNAPSHOT, [list(row) for row in self._state_at(0)])]
+                    first = 1
+                else:
+                    records = []
+                records += [self._read(offset) for offset in self._stack[first:]]
+                for kind, payload in records:
+                    target.write(self._encode(kind, payload))
+            self.close()
+            os.replace(temporary, self.path)
+            self._open()
+
+    def compact_in_background(self, keep=None):
+        thread = threading.Thread(target=self.compact, args=(keep,), daemon=True)
+        thread.start()
+        return thread
+
+    def close(self):
+        with self._lock:
+            if self._map is not None:
+                self._map.close()
+                self._map = None
+            self._file.close()
+
+
+class CartLogStore:
+    """Журнали історії кошиків по користувачах; відкривається лише потрібний журнал.
+    Відкриті журнали тримаються в LRU-кеші на max_open записів, тож усі
+    звернення до одного користувача працюють з тим самим стеком записів, а
+    кількість відкритих файлів обмежена. Витіснений журнал закривається:
+    повернутий history() об'єкт варто тримати лише на час операції."""
+    def __init__(self, directory, max_open=1024, **options):
+        self.directory = directory
+        self.max_open = max_open
+        self.options = options
+        self._histories = OrderedDict()
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def history(self, user_id):
+        with self._lock:
+            history = self._histories.get(user_id)
+            if history is not None:
+                self._histories.move_to_end(user_id)
+                return history
+            path = os.path.join(self.directory, f"{user_id}.cartlog")
+            history = self._histories[user_id] = FileCartHistory(path, **self.options)
+            while len(self._histories) > self.max_open:
+                _, evicted = self._histories.popitem(last=False)
+                evicted.close()
+            return history
+
+    def close(self, user_id=None):
+        """Закриває журнал користувача або, без user_id, усі відкриті журнали."""
+        with self._lock:
+            user_ids = list(self._histories) if user_id is None else [user_id]
+            for key in user_ids:
+                history = self._histories.pop(key, None)
+                if history is not None:
+                    history.close()
+
+
 # ⚙️ Налаштування користувача з Memento
 class UserSettings:
     def __init__(self, theme, language):
@@ -90,10 +404,75 @@ class UserSettings:
         self.language = memento.language
 
 
+# Знімки налаштувань незмінні та інтерновані: однакові (theme, language)
+# дають той самий об'єкт, тож пам'ять росте з кількістю різних конфігурацій,
+# а не з кількістю користувачів.
 class SettingsMemento:
+    __slots__ = ("theme", "language")
+    _pool = {}
+
+    def __new__(cls, theme, language):
+        key = (theme, language)
+        memento = cls._pool.get(key)
+        if memento is None:
+            memento = object.__new__(cls)
+            object.__setattr__(memento, "theme", theme)
+            object.__setattr__(memento, "language", language)
+            cls._pool[key] = memento
+        return memento
+
     def __init__(self, theme, language):
-        self.theme = theme
-        self.language = language
+        pass
+
+    def __setattr__(self, name, value):
+        raise AttributeError("SettingsMemento незмінний")
+
+    def __reduce__(self):
+        return (SettingsMemento, (self.theme, self.language))
+
+    @classmethod
+    def distinct_count(cls):
+        return len(cls._pool)
+
+
+# Сховище знімків налаштувань: для кожного користувача — ланцюжок версій
+# з посилань на спільні знімки. Одна версія зберігається як саме посилання,
+# список з'являється лише з другою версією.
+class SettingsSnapshotStore:
+    def __init__(self):
+        self._versions = {}
+
+    def backup(self, user_id, settings):
+        memento = settings.create_memento()
+        chain = self._versions.get(user_id)
+        if chain is None:
+            self._versions[user_id] = memento
+        elif isinstance(chain, list):
+            chain.append(memento)
+        else:
+            self._versions[user_id] = [chain, memento]
+        return memento
+
+    def versions(self, user_id):
+        chain = self._versions.get(user_id)
+        if chain is None:
+            return []
+        return list(chain) if isinstance(chain, list) else [chain]
+
+    def restore(self, user_id, settings, version=-1):
+        settings.restore(self.versions(user_id)[version])
+
+    def memory_report(self):
+        users = len(self._versions)
+        chains = sum(sys.getsizeof(chain) for chain in self._versions.values() if isinstance(chain, list))
+        records = sum(sys.getsizeof(memento) for memento in SettingsMemento._pool.values())
+        total = sys.getsizeof(self._versions) + chains + records
+        return {
+            "users": users,
+            "distinct_configurations": SettingsMemento.distinct_count(),
+            "bytes": total,
+            "bytes_per_million_users": total * 1_000_000 // users if users else 0,
+        }
 
 
 # 🧠 Патерн Відвідувач
@@ -126,20 +505,215 @@ class SalesAnalyticsVisitor(Visitor):
         for book in order.books:
             book.accept(self)
 
+    def merge(self, other):
+        """Додає часткові результати іншого відвідувача (крок reduce)."""
+        for genre, count in other.genre_count.items():
+            self.genre_count[genre] = self.genre_count.get(genre, 0) + count
+        # visit_customer записує кількість замовлень клієнта, а не приріст,
+        # тож повторне значення для того самого клієнта лише перезаписується
+        self.customer_activity.update(other.customer_activity)
+        self.total_revenue += other.total_revenue
+        return self
+
+
+# 🗂 Паралельна аналітика map-reduce: замовлення діляться на шарди, кожен
+# процес пулу проходить свій шард власним SalesAnalyticsVisitor, а часткові
+# результати зливаються через merge(). У процеси передаються лише книги
+# замовлень, без клієнтів з усією їхньою історією.
+def _analyze_shard(orders_books):
+    visitor = SalesAnalyticsVisitor()
+    for books in orders_books:
+        Order(None, books).accept(visitor)
+    return visitor
+
+
+def _order_shards(orders, chunk_size):
+    orders = iter(orders)
+    while True:
+        shard = [order.books for order in islice(orders, chunk_size)]
+        if not shard:
+            return
+        yield shard
+
+
+def analyze_sharded(orders, customers=(), processes=None, chunk_size=10_000):
+    """orders — будь-який ітерований потік; у роботі не більше 2 шардів на процес,
+    тож пам'ять не росте з кількістю замовлень."""
+    result = SalesAnalyticsVisitor()
+    with ProcessPoolExecutor(processes) as pool:
+        limit = 2 * (processes or os.cpu_count() or 1)
+        pending = deque()
+        for shard in _order_shards(orders, chunk_size):
+            pending.append(pool.submit(_analyze_shard, shard))
+            if len(pending) >= limit:
+                result.merge(pending.popleft().result())
+        while pending:
+            result.merge(pending.popleft().result())
+    for customer in customers:
+        customer.accept(result)
+    return result
+
+
+# 🧮 Колонкова аналітика: замовлення розгортаються в масиви (код жанру і ціна
+# на кожну книгу, код клієнта на кожне замовлення), а підсумки рахуються
+# через bincount/accumulate замість подвійної диспетчеризації на кожну книгу.
+# Результат збігається з SalesAnalyticsVisitor, якщо orders містить усі
+# замовлення переданих клієнтів.
+class SalesColumns:
+    def __init__(self, orders):
+        if np is None:
+            raise ImportError("SalesColumns потребує NumPy")
+        genres = {}
+        customers = {}
+        genre_codes = []
+        prices = []
+        order_customers = []
+        for order in orders:
+            order_customers.append(customers.setdefault(order.customer.name, len(customers)))
+            for book in order.books:
+                genre_codes.append(genres.setdefault(book.genre, len(genres)))
+                prices.append(book.price)
+        self.genres = list(genres)
+        self.customers = customers
+        self.genre_codes = np.array(genre_codes, dtype=np.int32)
+        self.prices = np.array(prices)
+        self.order_customers = np.array(order_customers, dtype=np.int32)
+
+    def analyze(self, customers=()):
+        result = SalesAnalyticsVisitor()
+        counts = np.bincount(self.genre_codes, minlength=len(self.genres))
+        result.genre_count = dict(zip(self.genres, counts.tolist()))
+        # Послідовне накопичення дає ту саму суму, що й додавання по одній книзі
+        if len(self.prices):
+            result.total_revenue = np.add.accumulate(self.prices)[-1].item()
+        activity = np.bincount(self.order_customers, minlength=len(self.customers)).tolist()
+        for customer in customers:
+            code = self.customers.get(customer.name)
+            result.customer_activity[customer.name] = activity[code] if code is not None else 0
+        return result
+
+
+def benchmark_columnar_analytics(n_orders=200_000):
+    if np is None:
+        print("[Бенчмарк] NumPy не встановлено, колонкову аналітику пропущено")
+        return
+    genres = ["Дистопія", "Фентезі", "Дитяча", "Наука"]
+    customers = [Customer(f"Клієнт {i}") for i in range(1000)]
+    orders = []
+    for i in range(n_orders):
+        customer = customers[i % len(customers)]
+        order = Order(customer, [Book(f"Книга {j}", random.choice(genres), random.randint(100, 500))
+                                 for j in range(3)])
+        customer.add_order(order)
+        orders.append(order)
+
+    start = time.perf_counter()
+    visitor = SalesAnalyticsVisitor()
+    for order in orders:
+        order.accept(visitor)
+    for customer in customers:
+        customer.accept(visitor)
+    visitor_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    columns = SalesColumns(orders)
+    flatten_time = time.perf_counter() - start
+    start = time.perf_counter()
+    columnar = columns.analyze(customers)
+    columnar_time = time.perf_counter() - start
+
+    assert columnar.genre_count == visitor.genre_count
+    assert columnar.customer_activity == visitor.customer_activity
+    assert columnar.total_revenue == visitor.total_revenue
+    print(f"[Бенчмарк] {n_orders} замовлень: відвідувач {visitor_time:.3f} с, "
+          f"колонки {columnar_time:.4f} с (+ розгортання {flatten_time:.3f} с)")
+
+
+# 📤 Приймач звіту: рядки накопичуються і пишуться в потік великими блоками.
+# chunk_size=0 пише кожен рядок одразу (поведінка print за замовчуванням).
+class ReportSink:
+    def __init__(self, stream, chunk_size=1 << 16, close_stream=False):
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.close_stream = close_stream
+        self._buffer = []
+        self._size = 0
+
+    @classmethod
+    def open(cls, path, chunk_size=1 << 16):
+        """Файловий приймач; для шляхів *.gz вихід стискається gzip."""
+        if str(path).endswith(".gz"):
+            stream = gzip.open(path, "wt", encoding="utf-8", newline="")
+        else:
+            # Буферизацію блоками робить сам приймач, тож файл відкривається зі
+            # стандартним буфером: текстовий режим не допускає buffering=0
+            stream = open(path, "w", encoding="utf-8", newline="")
+        return cls(stream, chunk_size, close_stream=True)
+
+    def write(self, text):
+        self._buffer.append(text)
+        self._size += len(text)
+        if self._size >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        if self._buffer:
+            self.stream.write("".join(self._buffer))
+            self._buffer = []
+            self._size = 0
+        self.stream.flush()
+
+    def close(self):
+        self.flush()
+        if self.close_stream:
+            self.stream.close()
+
 
 # 📄 Відвідувач для генерації звітів
 class ReportVisitor(Visitor):
+    CSV_FIELDS = ("kind", "name", "genre", "price", "count")
+    TEXT_TEMPLATES = {
+        "book": "Книга: {1}, Жанр: {2}, Ціна: {3}",
+        "customer": "Клієнт: {1}, Кількість замовлень: {4}",
+        "order": "Замовлення клієнта: {1}, Кількість книг: {4}",
+    }
+
+    def __init__(self, sink=None, fmt="text"):
+        if fmt not in ("text", "csv", "jsonl"):
+            raise ValueError(f"Невідомий формат звіту: {fmt}")
+        self.sink = sink or ReportSink(sys.stdout, chunk_size=0)
+        self.fmt = fmt
+        self._csv = None
+        if fmt == "csv":
+            self._csv = csv.writer(self.sink, lineterminator="\n")
+            self._csv.writerow(self.CSV_FIELDS)
+
+    def _emit(self, row):
+        if self.fmt == "text":
+            self.sink.write(self.TEXT_TEMPLATES[row[0]].format(*row) + "\n")
+        elif self.fmt == "csv":
+            self._csv.writerow(["" if value is None else value for value in row])
+        else:
+            record = {field: value for field, value in zip(self.CSV_FIELDS, row) if value is not None}
+            self.sink.write(json.dumps(record, ensure_ascii=False) + "\n")
+
     def visit_book(self, book):
-        print(f"Книга: {book.title}, Жанр: {book.genre}, Ціна: {book.price}")
+        self._emit(("book", book.title, book.genre, book.price, None))
 
     def visit_customer(self, customer):
-        print(f"Клієнт: {customer.name}, Кількість замовлень: {len(customer.orders)}")
+        self._emit(("customer", customer.name, None, None, len(customer.orders)))
 
     def visit_order(self, order):
-        print(f"Замовлення клієнта: {order.customer.name}, Кількість книг: {len(order.books)}")
+        self._emit(("order", order.customer.name, None, None, len(order.books)))
         for book in order.books:
             book.accept(self)
 
+    def flush(self):
+        self.sink.flush()
+
+    def close(self):
+        self.sink.close()
+
 
 # ✅ Приклад використання
 if __name__ == "__main__":
@@ -187,4 +761,13 @@ if __name__ == "__main__":
 
     print("Аналітика за жанрами:", analytics.genre_count)
     print("Активність клієнтів:", analytics.customer_activity)
-    print("Загальний прибуток:", analytics.total_revenue)
\ No newline at end of file
+    print("Загальний прибуток:", analytics.total_revenue)
+
+    # Знімки налаштувань багатьох користувачів
+    snapshots = SettingsSnapshotStore()
+    for user_id in range(10_000):
+        snapshots.backup(user_id, UserSettings(("Світла", "Темна")[user_id % 2], ("UA", "EN")[user_id % 3 == 0]))
+    print("Пам'ять знімків налаштувань:", snapshots.memory_report())
+
+    if "--bench" in sys.argv:
+        benchmark_columnar_analytics()
@@ -1,10 +1,84 @@
+import sys
+import time
+import tracemalloc
+from array import array
 from copy import deepcopy
 
+# Типи, значення яких незмінні й можуть спільно використовуватись копіями
+_ATOMIC_TYPES = frozenset((str, int, float, bool, complex, bytes, type(None)))
+
+# Класи, для яких копіювання лише __dict__ еквівалентне deepcopy
+_fast_clone_types = {}
+
+def _sets_attributes(klass):
+    """Чи перехоплює клас присвоєння атрибутів: власний __setattr__ або
+    дескриптор даних, який можна записати (property з setter тощо)."""
+    if klass is object:
+        return False
+    if "__setattr__" in vars(klass):
+        return True
+    for name, attribute in vars(klass).items():
+        if name in ("__dict__", "__weakref__") or not hasattr(type(attribute), "__set__"):
+            continue
+        if isinstance(attribute, property) and attribute.fset is None:
+            continue
+        return True
+    return False
+
+def _can_fast_clone(cls):
+    """Швидкий шлях можливий, якщо клас не має власних __slots__, хуків копіювання
+    і не перехоплює присвоєння атрибутів: setattr у швидкому шляху інакше
+    виконав би валідацію чи заборону запису, яку deepcopy оминає."""
+    fast = _fast_clone_types.get(cls)
+    if fast is None:
+        slots = []
+        for klass in cls.__mro__:
+            declared = vars(klass).get("__slots__", ())
+            slots.extend((declared,) if isinstance(declared, str) else declared)
+        hooks = (getattr(cls, "__deepcopy__", None) is not None
+                 or getattr(cls, "__setstate__", None) is not None
+                 or getattr(cls, "__getstate__", None) is not getattr(object, "__getstate__", None)
+                 or cls.__reduce_ex__ is not object.__reduce_ex__
+                 or cls.__reduce__ is not object.__reduce__
+                 or any(_sets_attributes(klass) for klass in cls.__mro__))
+        fast = not hooks and all(name in ("__dict__", "__weakref__") for name in slots)
+        _fast_clone_types[cls] = fast
+    return fast
+
 # ----- Патерн "Прототип" -----
 class BookPrototype:
     """Базовий клас прототипу книги."""
-    def clone(self):
-        return deepcopy(self)
+    def clone(self, **overrides):
+        """Копіює поля напряму; deepcopy лише для змінюваних вкладених значень.
+        Класи з __slots__ або власними хуками копіювання копіюються через deepcopy."""
+        if not _can_fast_clone(type(self)):
+            clone = deepcopy(self)
+        else:
+            clone = object.__new__(type(self))
+            memo = {id(self): clone}
+            # setattr, а не __dict__.update: так CPython зберігає компактне
+            # представлення атрибутів зі спільними ключами класу
+            for name, value in self.__dict__.items():
+                setattr(clone, name, value if type(value) in _ATOMIC_TYPES else deepcopy(value, memo))
+        for name, value in overrides.items():
+            setattr(clone, name, value)
+        return clone
+
+    def clone_many(self, n, **overrides):
+        """n копій з однаковими змінами полів."""
+        if (not _can_fast_clone(type(self))
+                or any(type(value) not in _ATOMIC_TYPES for value in self.__dict__.values())):
+            return [self.clone(**overrides) for _ in range(n)]
+        template = dict(self.__dict__, **overrides).items()
+        cls = type(self)
+        new = object.__new__
+        clones = []
+        for _ in range(n):
+            clone = new(cls)
+            for name, value in template:
+                setattr(clone, name, value)
+            clones.append(clone)
+        return clones
 
 class Book(BookPrototype):
     """Клас книги, який підтримує клонування."""
@@ -18,6 +92,45 @@ class Book(BookPrototype):
     def __str__(self):
         return f"Книга: {self.title}, Автор: {self.author}, Жанр: {self.genre}, Ціна: {self.price}, ISBN: {self.isbn}"
 
+    def derive(self, **overrides):
+        """Копія-при-записі: посилається на цю книгу і зберігає лише змінені поля."""
+        return BookVariant(self, **overrides)
+
+class BookVariant(Book):
+    """Варіант книги, що зберігає у власному __dict__ лише перевизначені поля,
+    а решту читає з прототипу. Зміни прототипу видно в усіх його варіантах,
+    доки поле не перевизначене у варіанті."""
+    __slots__ = ("_prototype",)
+
+    def __init__(self, prototype, **overrides):
+        self._prototype = prototype
+        for name, value in overrides.items():
+            setattr(self, name, value)
+
+    def __getattr__(self, name):
+        if name == "_prototype" or name.startswith("__"):
+            raise AttributeError(name)
+        return getattr(self._prototype, name)
+
+    def _own_fields(self):
+        """Перевизначені поля; змінювані значення копіюються, як у Book.clone."""
+        return {name: value if type(value) in _ATOMIC_TYPES else deepcopy(value)
+                for name, value in self.__dict__.items()}
+
+    def clone(self, **overrides):
+        return BookVariant(self._prototype, **dict(self._own_fields(), **overrides))
+
+    def clone_many(self, n, **overrides):
+        return [self.clone(**overrides) for _ in range(n)]
+
+    def materialize(self):
+        """Незалежна книга з усіма полями, без посилання на прототип."""
+        prototype = self._prototype
+        book = prototype.materialize() if isinstance(prototype, BookVariant) else prototype.clone()
+        for name, value in self._own_fields().items():
+            setattr(book, name, value)
+        return book
+
 # ----- Патерн "Будівельник" -----
 class BookBuilder:
     """Будівельник для покрокового створення книги."""
@@ -50,6 +163,275 @@ class BookBuilder:
     def build(self):
         return self.book
 
+# ----- Пакетний будівельник: колонкове сховище -----
+class StringTable:
+    """Таблиця рядків для колонок з невеликою кількістю різних значень (автор, жанр):
+    кожен рядок зберігається один раз, колонка містить його код; код 0 — відсутнє значення.
+    prepare() перевіряє значення, push() лише дописує вже перевірене."""
+    def __init__(self):
+        self.strings = [None]
+        self.codes = array("I")
+        self._lookup = {None: 0}
+
+    def prepare(self, value):
+        if value is not None and not isinstance(value, str):
+            raise TypeError(f"очікувався рядок, отримано {type(value).__name__}")
+        return value
+
+    def push(self, value):
+        code = self._lookup.get(value)
+        if code is None:
+            code = self._lookup[value] = len(self.strings)
+            self.strings.append(value)
+        self.codes.append(code)
+
+    def get(self, row):
+        return self.strings[self.codes[row]]
+
+    def missing(self):
+        count = self.codes.count(0)
+        return count, self.codes.index(0) if count else None
+
+    def nbytes(self):
+        return (self.codes.itemsize * len(self.codes) + sys.getsizeof(self.strings)
+                + sys.getsizeof(self._lookup) + sum(sys.getsizeof(string) for string in self.strings[1:]))
+
+class TextColumn:
+    """Колонка унікальних рядків (назва, ISBN): UTF-8 байти підряд і масив зсувів.
+    Відсутні значення позначаються бітовою картою, по біту на рядок."""
+    def __init__(self):
+        self.data = bytearray()
+        self.offsets = array("Q", [0])
+        self.nulls = bytearray()
+
+    def prepare(self, value):
+        if value is None:
+            return None
+        if not isinstance(value, str):
+            raise TypeError(f"очікувався рядок, отримано {type(value).__name__}")
+        return value.encode("utf-8")
+
+    def push(self, encoded):
+        row = len(self.offsets) - 1
+        if not row & 7:
+            self.nulls.append(0)
+        if encoded is None:
+            self.nulls[row >> 3] |= 1 << (row & 7)
+        else:
+            self.data += encoded
+        self.offsets.append(len(self.data))
+
+    def get(self, row):
+        if self.nulls[row >> 3] >> (row & 7) & 1:
+            return None
+        return self.data[self.offsets[row]:self.offsets[row + 1]].decode("utf-8")
+
+    def missing(self):
+        count = bin(int.from_bytes(self.nulls, "little")).count("1")
+        if not count:
+            return 0, None
+        byte = len(self.nulls) - len(self.nulls.lstrip(b"\0"))
+        bits = self.nulls[byte]
+        return count, byte * 8 + (bits & -bits).bit_length() - 1
+
+    def nbytes(self):
+        return len(self.data) + self.offsets.itemsize * len(self.offsets) + len(self.nulls)
+
+class PriceColumn:
+    """Ціни у масиві double; відсутня ціна — NaN. Окремий байтовий масив
+    запам'ятовує цілі ціни, щоб view повертав 300, а не 300.0."""
+    def __init__(self):
+        self.values = array("d")
+        self.integral = array("B")
+
+    def prepare(self, value):
+        if value is None:
+            return float("nan"), 0
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            raise TypeError(f"ціна має бути числом, отримано {type(value).__name__}")
+        if isinstance(value, int):
+            price = float(value)
+            if price != value:
+                raise ValueError(f"ціну {value} не можна точно зберегти як double")
+            return price, 1
+        return value, 0
+
+    def push(self, prepared):
+        price, integral = prepared
+        self.values.append(price)
+        self.integral.append(integral)
+
+    def get(self, row):
+        price = self.values[row]
+        if price != price:
+            return None
+        return int(price) if self.integral[row] else price
+
+    def missing(self):
+        rows = [row for row, price in enumerate(self.values) if price != price]
+        return len(rows), rows[0] if rows else None
+
+    def nbytes(self):
+        return self.values.itemsize * len(self.values) + self.integral.itemsize * len(self.integral)
+
+class BookStore:
+    """Книги у вигляді колонок (struct-of-arrays); Book створюється лише як view на рядок."""
+    def __init__(self, columns):
+        self.columns = columns
+
+    def __len__(self):
+        return len(self.columns["price"].values)
+
+    def __getitem__(self, row):
+        if not -len(self) <= row < len(self):
+            raise IndexError(row)
+        return BookView(self, row % len(self))
+
+    def __iter__(self):
+        for row in range(len(self)):
+            yield BookView(self, row)
+
+    def memory_usage(self):
+        return {field: column.nbytes() for field, column in self.columns.items()}
+
+def _view_field(field):
+    return property(lambda view: view._store.columns[field].get(view._row))
+
+class BookView(Book):
+    """Легке представлення рядка BookStore з інтерфейсом Book; поля лише для читання."""
+    __slots__ = ("_store", "_row")
+
+    title = _view_field("title")
+    author = _view_field("author")
+    price = _view_field("price")
+    genre = _view_field("genre")
+    isbn = _view_field("isbn")
+
+    def __init__(self, store, row):
+        self._store = store
+        self._row = row
+
+    def clone(self, **overrides):
+        """Матеріалізує рядок у самостійну Book."""
+        book = Book(self.title, self.author, self.price, self.genre, self.isbn)
+        for name, value in overrides.items():
+            setattr(book, name, value)
+        return book
+
+    materialize = clone
+
+    def clone_many(self, n, **overrides):
+        return [self.clone(**overrides) for _ in range(n)]
+
+class BookBatchBuilder:
+    """Пакетний будівельник: рядки дописуються в колонки, а перевірка
+    обов'язкових полів виконується для всього пакета в build_all()."""
+    REQUIRED = ("title", "author", "price")
+
+    def __init__(self, required=REQUIRED):
+        self.required = required
+        self.reset()
+
+    def reset(self):
+        self.columns = {
+            "title": TextColumn(),
+            "author": StringTable(),
+            "price": PriceColumn(),
+            "genre": StringTable(),
+            "isbn": TextColumn(),
+        }
+        self._prepare = [column.prepare for column in self.columns.values()]
+        self._push = [column.push for column in self.columns.values()]
+
+    def add(self, title=None, author=None, price=None, genre=None, isbn=None):
+        # Спершу перевіряються всі п'ять значень: якщо одне з них некоректне,
+        # жодна колонка не змінюється і пакет лишається вирівняним
+        prepare_title, prepare_author, prepare_price, prepare_genre, prepare_isbn = self._prepare
+        title, author, price = prepare_title(title), prepare_author(author), prepare_price(price)
+        genre, isbn = prepare_genre(genre), prepare_isbn(isbn)
+        push_title, push_author, push_price, push_genre, push_isbn = self._push
+        push_title(title)
+        push_author(author)
+        push_price(price)
+        push_genre(genre)
+        push_isbn(isbn)
+        return self
+
+    def add_rows(self, rows):
+        """Рядки (title, author, price, genre, isbn)."""
+        add = self.add
+        for row in rows:
+            add(*row)
+        return self
+
+    def build_all(self):
+        problems = []
+        for field in self.required:
+            count, first = self.columns[field].missing()
+            if count:
+                problems.append(f"{field}: {count} рядків без значення (перший — {first})")
+        if problems:
+            raise ValueError("Не заповнені обов'язкові поля: " + "; ".join(problems))
+        store = BookStore(self.columns)
+        self.reset()
+        return store
+
+# ----- Бенчмарк клонування -----
+def benchmark_clone(n=200_000):
+    prototype = Book("Володар перснів", "Дж. Р. Р. Толкін", 500, "Фентезі", "978-617-12-1234-5")
+
+    start = time.perf_counter()
+    for _ in range(n):
+        deepcopy(prototype)
+    deepcopy_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(n):
+        prototype.clone()
+    clone_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    prototype.clone_many(n, price=450)
+    clone_many_time = time.perf_counter() - start
+
+    print(f"[Бенчмарк] {n} копій: deepcopy {deepcopy_time:.3f} с, clone() {clone_time:.3f} с, "
+          f"clone_many() {clone_many_time:.3f} с")
+
+    for label, make in (("clone()", lambda i: prototype.clone(isbn=i)),
+                        ("derive()", lambda i: prototype.derive(isbn=i))):
+        tracemalloc.start()
+        variants = [make(i) for i in range(n)]
+        allocated, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del variants
+        print(f"[Бенчмарк] {label}: {allocated / n:.0f} байт на варіант")
+
+def benchmark_batch_builder(n=1_000_000):
+    def rows():
+        # Рядки фіду створюються під час читання, як при розборі файлу
+        for i in range(n):
+            yield (f"Книга {i}", f"Автор {i % 5000}", 100 + i % 400,
+                   ("Фентезі", "Наука", "Класика")[i % 3], f"978-617-{i:08d}")
+
+    tracemalloc.start()
+    books = [Book(*row) for row in rows()]
+    objects_memory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del books
+
+    tracemalloc.start()
+    store = BookBatchBuilder().add_rows(rows()).build_all()
+    store_memory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del store
+
+    start = time.perf_counter()
+    store = BookBatchBuilder().add_rows(rows()).build_all()
+    elapsed = time.perf_counter() - start
+
+    print(f"[Бенчмарк] {n} рядків: об'єкти Book {objects_memory / n:.0f} байт/рядок, "
+          f"колонки {store_memory / n:.0f} байт/рядок, імпорт {elapsed:.2f} с ({len(store)} книг)")
+
 # ----- Використання -----
 if __name__ == "__main__":
     # Використання патерну "Будівельник"
@@ -70,3 +452,21 @@ if __name__ == "__main__":
     
     print("Клонована книга:")
     print(cloned_book)
+
+    # Копія-при-записі: зберігається лише змінена ціна
+    variant = new_book.derive(price=400)
+    print("Варіант книги:")
+    print(variant)
+
+    # Пакетний будівельник
+    store = (BookBatchBuilder()
+             .add("Кобзар", "Т. Шевченко", 300, "Поезія", "978-966-03-0001-1")
+             .add("Тигролови", "І. Багряний", 250, "Пригоди", "978-966-03-0002-8")
+             .build_all())
+    print("Книги з колонкового сховища:")
+    for book in store:
+        print(book)
+
+    if "--bench" in sys.argv:
+        benchmark_clone()
+        benchmark_batch_builder()